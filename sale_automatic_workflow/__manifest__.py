@@ -18,6 +18,7 @@
         "security/ir.model.access.csv",
         "views/sale_view.xml",
         "views/sale_workflow_process_view.xml",
+        "views/sale_workflow_run_view.xml",
         "data/automatic_workflow_data.xml",
     ],
     "installable": True,
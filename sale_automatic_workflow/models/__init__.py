@@ -1,6 +1,8 @@
 from . import account_move
 from . import automatic_workflow_job
+from . import automatic_workflow_pending
 from . import sale_order
 from . import sale_workflow_process
+from . import sale_workflow_run
 from . import stock_move
 from . import stock_picking
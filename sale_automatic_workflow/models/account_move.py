@@ -3,7 +3,7 @@
 # Copyright 2016 Sodexis
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class AccountMove(models.Model):
@@ -12,3 +12,16 @@ class AccountMove(models.Model):
     workflow_process_id = fields.Many2one(
         comodel_name="sale.workflow.process", string="Sale Workflow Process"
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        moves = super().create(vals_list)
+        self.env["automatic.workflow.pending"]._add_records(
+            moves.filtered("workflow_process_id")
+        )
+        return moves
+
+    def _write(self, vals):
+        res = super()._write(vals)
+        self.env["automatic.workflow.pending"]._add_records(self, vals)
+        return res
@@ -4,10 +4,16 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import logging
+import math
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
 from odoo import api, fields, models
-from odoo.tools.safe_eval import safe_eval
+from odoo.tools import split_every
 
 _logger = logging.getLogger(__name__)
 
@@ -25,6 +31,44 @@ def savepoint(cr):
         _logger.exception("Error during an automatic workflow action.")
 
 
+class StepStats:
+    """Counters of a workflow step, filled while its records are processed"""
+
+    def __init__(self):
+        self.processed = 0
+        self.bypassed = 0
+        self.failed = 0
+        self.enqueued = 0
+        self.latencies = []
+        self.duration = 0.0
+        self.query_count = 0
+
+    @property
+    def candidates(self):
+        return self.processed + self.bypassed + self.failed + self.enqueued
+
+    def add(self, results, duration):
+        """Account the results of an action which lasted ``duration`` seconds"""
+        for result in results:
+            result = str(result)
+            if "job bypassed" in result:
+                self.bypassed += 1
+            elif " failed: " in result:
+                self.failed += 1
+            else:
+                self.processed += 1
+        if results:
+            self.latencies += [duration / len(results)] * len(results)
+
+    def percentile(self, rank):
+        """Return the latency of the given percentile rank (nearest rank)"""
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        index = max(math.ceil(rank / 100 * len(latencies)) - 1, 0)
+        return latencies[index]
+
+
 class AutomaticWorkflowJob(models.Model):
     """Scheduler that will play automatically the validation of
     invoices, pickings..."""
@@ -35,6 +79,101 @@ class AutomaticWorkflowJob(models.Model):
         " invoices, pickings..."
     )
 
+    def _get_batches(self, records):
+        """Split records in chunks of the workflow batch size, per company"""
+        batch_size = self.env.context.get("auto_workflow_batch_size") or len(records)
+        for company in records.company_id:
+            company_records = records.filtered(lambda r: r.company_id == company)
+            for chunk in split_every(batch_size, company_records.ids, records.browse):
+                yield chunk.with_company(company)
+
+    def _process_records(
+        self, records, domain_filter, method_name, batch_method_name=None
+    ):
+        """Apply the ``method_name`` action on each record
+
+        When ``batch_method_name`` is given, the records are processed by
+        chunks with this action instead, see ``_process_batch``.
+        """
+        if not batch_method_name:
+            return self._process_one_by_one(records, domain_filter, method_name)
+        results = []
+        for chunk in self._get_batches(records):
+            results += self._process_batch(
+                chunk, domain_filter, method_name, batch_method_name
+            )
+        return results
+
+    def _process_one_by_one(self, records, domain_filter, method_name):
+        """Apply the ``method_name`` action on each record in its own savepoint
+
+        The errors are logged then discarded. Return the results of the
+        actions.
+        """
+        results = []
+        for record in records:
+            start = time.perf_counter()
+            try:
+                with self.env.cr.savepoint():
+                    result = getattr(self, method_name)(
+                        record.with_company(record.company_id), domain_filter
+                    )
+            except Exception as err:
+                _logger.exception("Error during an automatic workflow action.")
+                result = "{} {} failed: {}".format(record.display_name, record, err)
+            self._add_stats([result], time.perf_counter() - start)
+            results.append(result)
+        return results
+
+    def _process_batch(self, records, domain_filter, method_name, batch_method_name):
+        """Apply the ``batch_method_name`` action on all the records at once
+
+        When it fails, its savepoint is rolled back and the records are
+        processed again one by one with ``method_name``, so a single faulty
+        record does not block the whole chunk.
+        """
+        start = time.perf_counter()
+        try:
+            with self.env.cr.savepoint():
+                results = getattr(self, batch_method_name)(records, domain_filter)
+            self._add_stats(results, time.perf_counter() - start)
+            return results
+        except Exception:
+            _logger.warning(
+                "Error during an automatic workflow batch action on %s, "
+                "processing the records one by one.",
+                records,
+                exc_info=True,
+            )
+        return self._process_one_by_one(records, domain_filter, method_name)
+
+    def _add_stats(self, results, duration):
+        stats = self.env.context.get("auto_workflow_stats")
+        if stats is not None:
+            stats.add(results, duration)
+
+    @contextmanager
+    def _collect_step_stats(self, sale_workflow, step):
+        """Yield the job with a statistics collector in its context, then log
+        the statistics of the step"""
+        stats = StepStats()
+        start = time.perf_counter()
+        query_count = self.env.cr.sql_log_count
+        yield self.with_context(auto_workflow_stats=stats)
+        stats.duration = time.perf_counter() - start
+        stats.query_count = self.env.cr.sql_log_count - query_count
+        self.env["sale.workflow.run"]._log_step(sale_workflow, step, stats)
+
+    def _batch_results(self, records, processed, message):
+        """Return the result of each record of a batch action"""
+        return [
+            "{} {} {}".format(record.display_name, record, message)
+            for record in processed
+        ] + [
+            "{} {} job bypassed".format(record.display_name, record)
+            for record in records - processed
+        ]
+
     def _do_validate_sale_order(self, sale, domain_filter):
         """Validate a sales order, filter ensure no duplication"""
         if not self.env["sale.order"].search_count(
@@ -58,17 +197,28 @@ class AutomaticWorkflowJob(models.Model):
             sale.display_name, sale
         )
 
+    def _do_validate_sale_orders_batch(self, sales, domain_filter):
+        """Validate sales orders at once, filter ensure no duplication"""
+        to_validate = sales.search([("id", "in", sales.ids)] + domain_filter)
+        to_validate.action_confirm()
+        return self._batch_results(sales, to_validate, "confirmed successfully")
+
     @api.model
     def _validate_sale_orders(self, order_filter):
         sale_obj = self.env["sale.order"]
         sales = sale_obj.search(order_filter)
         _logger.debug("Sale Orders to validate: %s", sales.ids)
-        for sale in sales:
-            with savepoint(self.env.cr):
-                self._do_validate_sale_order(
-                    sale.with_company(sale.company_id), order_filter
-                )
-                if self.env.context.get("send_order_confirmation_mail"):
+        self._process_records(
+            sales,
+            order_filter,
+            "_do_validate_sale_order",
+            batch_method_name="_do_validate_sale_orders_batch"
+            if self.env.context.get("auto_workflow_batch_size")
+            else None,
+        )
+        if self.env.context.get("send_order_confirmation_mail"):
+            for sale in sales:
+                with savepoint(self.env.cr):
                     self._do_send_order_confirmation_mail(sale)
 
     def _do_create_invoice(self, sale, domain_filter):
@@ -83,16 +233,29 @@ class AutomaticWorkflowJob(models.Model):
         payment.with_context(active_model="sale.order").create_invoices()
         return "{} {} create invoice successfully".format(sale.display_name, sale)
 
+    def _do_create_invoices_grouped(self, sales, domain_filter):
+        """Create the invoices of sales orders at once, grouped according to
+        the invoice grouping keys, filter ensure no duplication"""
+        to_invoice = sales.search([("id", "in", sales.ids)] + domain_filter)
+        if to_invoice:
+            to_invoice._create_invoices(final=True)
+        return self._batch_results(sales, to_invoice, "create invoice successfully")
+
     @api.model
     def _create_invoices(self, create_filter):
         sale_obj = self.env["sale.order"]
         sales = sale_obj.search(create_filter)
         _logger.debug("Sale Orders to create Invoice: %s", sales.ids)
-        for sale in sales:
-            with savepoint(self.env.cr):
-                self._do_create_invoice(
-                    sale.with_company(sale.company_id), create_filter
-                )
+        if self.env.context.get("auto_workflow_group_invoices"):
+            # keep the orders of a same partner in the same chunk
+            self._process_records(
+                sales.sorted(lambda sale: sale.partner_id.id),
+                create_filter,
+                "_do_create_invoice",
+                batch_method_name="_do_create_invoices_grouped",
+            )
+        else:
+            self._process_records(sales, create_filter, "_do_create_invoice")
 
     def _do_validate_invoice(self, invoice, domain_filter):
         """Validate an invoice, filter ensure no duplication"""
@@ -105,16 +268,27 @@ class AutomaticWorkflowJob(models.Model):
             invoice.display_name, invoice
         )
 
+    def _do_validate_invoices_batch(self, invoices, domain_filter):
+        """Validate invoices at once, filter ensure no duplication"""
+        to_validate = invoices.search([("id", "in", invoices.ids)] + domain_filter)
+        to_validate.action_post()
+        return self._batch_results(
+            invoices, to_validate, "validate invoice successfully"
+        )
+
     @api.model
     def _validate_invoices(self, validate_invoice_filter):
         move_obj = self.env["account.move"]
         invoices = move_obj.search(validate_invoice_filter)
         _logger.debug("Invoices to validate: %s", invoices.ids)
-        for invoice in invoices:
-            with savepoint(self.env.cr):
-                self._do_validate_invoice(
-                    invoice.with_company(invoice.company_id), validate_invoice_filter
-                )
+        self._process_records(
+            invoices,
+            validate_invoice_filter,
+            "_do_validate_invoice",
+            batch_method_name="_do_validate_invoices_batch"
+            if self.env.context.get("auto_workflow_batch_size")
+            else None,
+        )
 
     def _do_send_invoice(self, invoice, domain_filter):
         """Validate an invoice, filter ensure no duplication"""
@@ -123,6 +297,10 @@ class AutomaticWorkflowJob(models.Model):
         ):
             return "{} {} job bypassed".format(invoice.display_name, invoice)
 
+        self._send_invoice_mail(invoice)
+        return "{} {} sent invoice successfully".format(invoice.display_name, invoice)
+
+    def _send_invoice_mail(self, invoice):
         # take the context from the actual action_invoice_sent method
         action = invoice.action_invoice_sent()
         action_context = action["context"]
@@ -149,18 +327,43 @@ class AutomaticWorkflowJob(models.Model):
         invoice_send_wizard.onchange_is_email()
         invoice_send_wizard._send_email()
 
-        return "{} {} sent invoice successfully".format(invoice.display_name, invoice)
+    def _do_send_invoices_batch(self, invoices, domain_filter):
+        """Send invoices by email at once, filter ensure no duplication
+
+        The PDF of the invoices are rendered at once per template, then each
+        invoice is sent like in the single mode, but the emails are queued
+        and sent later by the mail queue cron.
+        """
+        to_send = invoices.search([("id", "in", invoices.ids)] + domain_filter)
+        invoice_ids_by_template = defaultdict(list)
+        for invoice in to_send:
+            invoice_ids_by_template[invoice._get_mail_template()].append(invoice.id)
+        for template_xmlid, invoice_ids in invoice_ids_by_template.items():
+            template = self.env.ref(template_xmlid)
+            # render the PDF of all the invoices at once, they are stored as
+            # attachments and reused when the emails are generated
+            if template.report_template.attachment_use:
+                self.env["ir.actions.report"]._render_qweb_pdf(
+                    template.report_template, invoice_ids
+                )
+        queue_self = self.with_context(mail_notify_force_send=False)
+        for invoice in to_send:
+            queue_self._send_invoice_mail(invoice)
+        return self._batch_results(invoices, to_send, "sent invoice successfully")
 
     @api.model
     def _send_invoices(self, send_invoice_filter):
         move_obj = self.env["account.move"]
         invoices = move_obj.search(send_invoice_filter)
         _logger.debug("Invoices to send: %s", invoices.ids)
-        for invoice in invoices:
-            with savepoint(self.env.cr):
-                self._do_send_invoice(
-                    invoice.with_company(invoice.company_id), send_invoice_filter
-                )
+        self._process_records(
+            invoices,
+            send_invoice_filter,
+            "_do_send_invoice",
+            batch_method_name="_do_send_invoices_batch"
+            if self.env.context.get("auto_workflow_batch_size")
+            else None,
+        )
 
     def _do_validate_picking(self, picking, domain_filter):
         """Validate a stock.picking, filter ensure no duplication"""
@@ -173,14 +376,40 @@ class AutomaticWorkflowJob(models.Model):
             picking.display_name, picking
         )
 
+    def _do_validate_pickings_batch(self, pickings, domain_filter):
+        """Validate pickings at once, filter ensure no duplication
+
+        The pickings are validated together per operation type, the batches
+        being already split per company.
+        """
+        to_validate = pickings.search([("id", "in", pickings.ids)] + domain_filter)
+        picking_ids_by_type = defaultdict(list)
+        for picking in to_validate:
+            picking_ids_by_type[picking.picking_type_id].append(picking.id)
+        create_backorder = self.env.context.get("auto_workflow_picking_backorder", True)
+        for picking_ids in picking_ids_by_type.values():
+            to_validate.browse(picking_ids).validate_pickings_batch(
+                create_backorder=create_backorder
+            )
+        return self._batch_results(
+            pickings,
+            to_validate.filtered(lambda p: p.state == "done"),
+            "validate picking successfully",
+        )
+
     @api.model
     def _validate_pickings(self, picking_filter):
         picking_obj = self.env["stock.picking"]
         pickings = picking_obj.search(picking_filter)
         _logger.debug("Pickings to validate: %s", pickings.ids)
-        for picking in pickings:
-            with savepoint(self.env.cr):
-                self._do_validate_picking(picking, picking_filter)
+        self._process_records(
+            pickings,
+            picking_filter,
+            "_do_validate_picking",
+            batch_method_name="_do_validate_pickings_batch"
+            if self.env.context.get("auto_workflow_batch_size")
+            else None,
+        )
 
     def _do_sale_done(self, sale, domain_filter):
         """Set a sales order to done, filter ensure no duplication"""
@@ -191,14 +420,25 @@ class AutomaticWorkflowJob(models.Model):
         sale.action_done()
         return "{} {} set done successfully".format(sale.display_name, sale)
 
+    def _do_sale_done_batch(self, sales, domain_filter):
+        """Set sales orders to done at once, filter ensure no duplication"""
+        to_done = sales.search([("id", "in", sales.ids)] + domain_filter)
+        to_done.action_done()
+        return self._batch_results(sales, to_done, "set done successfully")
+
     @api.model
     def _sale_done(self, sale_done_filter):
         sale_obj = self.env["sale.order"]
         sales = sale_obj.search(sale_done_filter)
         _logger.debug("Sale Orders to done: %s", sales.ids)
-        for sale in sales:
-            with savepoint(self.env.cr):
-                self._do_sale_done(sale.with_company(sale.company_id), sale_done_filter)
+        self._process_records(
+            sales,
+            sale_done_filter,
+            "_do_sale_done",
+            batch_method_name="_do_sale_done_batch"
+            if self.env.context.get("auto_workflow_batch_size")
+            else None,
+        )
 
     def _prepare_dict_account_payment(self, invoice):
         partner_type = (
@@ -214,15 +454,37 @@ class AutomaticWorkflowJob(models.Model):
             "date": fields.Date.context_today(self),
         }
 
+    def _do_register_payment(self, invoice, domain_filter):
+        """Register the payment of an invoice, filter ensure no duplication"""
+        if not self.env["account.move"].search_count(
+            [("id", "=", invoice.id)] + domain_filter
+        ):
+            return "{} {} job bypassed".format(invoice.display_name, invoice)
+        self._register_payment_invoice(invoice)
+        return "{} {} register payment successfully".format(
+            invoice.display_name, invoice
+        )
+
+    def _do_register_payments_batch(self, invoices, domain_filter):
+        """Register the payments of invoices at once, filter ensure no
+        duplication"""
+        to_pay = invoices.search([("id", "in", invoices.ids)] + domain_filter)
+        paid = self._register_payment_invoices(to_pay)
+        return self._batch_results(invoices, paid, "register payment successfully")
+
     @api.model
     def _register_payments(self, payment_filter):
         invoice_obj = self.env["account.move"]
         invoices = invoice_obj.search(payment_filter)
         _logger.debug("Invoices to Register Payment: %s", invoices.ids)
-        for invoice in invoices:
-            with savepoint(self.env.cr):
-                self._register_payment_invoice(invoice)
-        return
+        self._process_records(
+            invoices,
+            payment_filter,
+            "_do_register_payment",
+            batch_method_name="_do_register_payments_batch"
+            if self.env.context.get("auto_workflow_batch_size")
+            else None,
+        )
 
     def _register_payment_invoice(self, invoice):
         payment = self.env["account.payment"].create(
@@ -241,47 +503,201 @@ class AutomaticWorkflowJob(models.Model):
                 [("account_id", "=", account.id), ("reconciled", "=", False)]
             ).reconcile()
 
+    def _register_payment_invoices(self, invoices):
+        """Create and post the payments of the invoices at once, then
+        reconcile them with one call per account and commercial partner
+
+        Return the invoices whose payment was registered.
+        """
+        if not invoices:
+            return invoices
+        payments = self.env["account.payment"].create(
+            [self._prepare_dict_account_payment(invoice) for invoice in invoices]
+        )
+        payments.action_post()
+
+        domain = [
+            ("account_type", "in", ("asset_receivable", "liability_payable")),
+            ("reconciled", "=", False),
+        ]
+        lines = (payments.line_ids + invoices.line_ids).filtered_domain(domain)
+        line_ids_by_key = defaultdict(list)
+        for line in lines:
+            key = (line.account_id, line.partner_id.commercial_partner_id)
+            line_ids_by_key[key].append(line.id)
+        for line_ids in line_ids_by_key.values():
+            lines.browse(line_ids).reconcile()
+        return invoices
+
+    def _get_step_domain(self, sale_workflow, filter_field):
+        """Return the domain of the records to process in a workflow step"""
+        domain = sale_workflow._get_filter_domain(filter_field) + [
+            ("workflow_process_id", "=", sale_workflow.id)
+        ]
+        if self.env.context.get("auto_workflow_company_id"):
+            domain.append(
+                ("company_id", "=", self.env.context["auto_workflow_company_id"])
+            )
+        if sale_workflow.incremental_mode:
+            model_name = sale_workflow[filter_field].model_id
+            pending_ids = self.env["automatic.workflow.pending"]._get_pending_ids(
+                model_name
+            )
+            domain.append(("id", "in", pending_ids))
+        return domain
+
     @api.model
     def run_with_workflow(self, sale_workflow):
-        workflow_domain = [("workflow_process_id", "=", sale_workflow.id)]
+        workflow_job = self.with_context(
+            auto_workflow_batch_size=sale_workflow.batch_mode
+            and sale_workflow.batch_size
+        )
         if sale_workflow.validate_order:
-            self.with_context(
-                send_order_confirmation_mail=sale_workflow.send_order_confirmation_mail
-            )._validate_sale_orders(
-                safe_eval(sale_workflow.order_filter_id.domain) + workflow_domain
-            )
+            with workflow_job._collect_step_stats(
+                sale_workflow, "validate_order"
+            ) as step_job:
+                step_job.with_context(
+                    send_order_confirmation_mail=(
+                        sale_workflow.send_order_confirmation_mail
+                    )
+                )._validate_sale_orders(
+                    self._get_step_domain(sale_workflow, "order_filter_id")
+                )
         if sale_workflow.validate_picking:
-            self._validate_pickings(
-                safe_eval(sale_workflow.picking_filter_id.domain) + workflow_domain
-            )
+            with workflow_job._collect_step_stats(
+                sale_workflow, "validate_picking"
+            ) as step_job:
+                step_job.with_context(
+                    auto_workflow_picking_backorder=(
+                        sale_workflow.picking_create_backorder
+                    )
+                )._validate_pickings(
+                    self._get_step_domain(sale_workflow, "picking_filter_id")
+                )
         if sale_workflow.create_invoice:
-            self._create_invoices(
-                safe_eval(sale_workflow.create_invoice_filter_id.domain)
-                + workflow_domain
-            )
+            with workflow_job._collect_step_stats(
+                sale_workflow, "create_invoice"
+            ) as step_job:
+                step_job.with_context(
+                    auto_workflow_group_invoices=sale_workflow.group_invoices
+                )._create_invoices(
+                    self._get_step_domain(sale_workflow, "create_invoice_filter_id")
+                )
         if sale_workflow.validate_invoice:
-            self._validate_invoices(
-                safe_eval(sale_workflow.validate_invoice_filter_id.domain)
-                + workflow_domain
-            )
+            with workflow_job._collect_step_stats(
+                sale_workflow, "validate_invoice"
+            ) as step_job:
+                step_job._validate_invoices(
+                    self._get_step_domain(sale_workflow, "validate_invoice_filter_id")
+                )
         if sale_workflow.send_invoice:
-            self._send_invoices(
-                safe_eval(sale_workflow.send_invoice_filter_id.domain) + workflow_domain
-            )
+            with workflow_job._collect_step_stats(
+                sale_workflow, "send_invoice"
+            ) as step_job:
+                step_job._send_invoices(
+                    self._get_step_domain(sale_workflow, "send_invoice_filter_id")
+                )
         if sale_workflow.sale_done:
-            self._sale_done(
-                safe_eval(sale_workflow.sale_done_filter_id.domain) + workflow_domain
-            )
+            with workflow_job._collect_step_stats(
+                sale_workflow, "sale_done"
+            ) as step_job:
+                step_job._sale_done(
+                    self._get_step_domain(sale_workflow, "sale_done_filter_id")
+                )
 
         if sale_workflow.register_payment:
-            self._register_payments(
-                safe_eval(sale_workflow.payment_filter_id.domain) + workflow_domain
-            )
+            with workflow_job._collect_step_stats(
+                sale_workflow, "register_payment"
+            ) as step_job:
+                step_job._register_payments(
+                    self._get_step_domain(sale_workflow, "payment_filter_id")
+                )
 
     @api.model
     def run(self):
         """Must be called from ir.cron"""
+        pending_model = self.env["automatic.workflow.pending"]
+        last_pending_id = pending_model._get_last_id()
         sale_workflow_process = self.env["sale.workflow.process"]
         for sale_workflow in sale_workflow_process.search([]):
             self.run_with_workflow(sale_workflow)
+        pending_model._clear(last_pending_id)
+        return True
+
+    def _run_shard(self, sale_workflow, company):
+        """Run a workflow on the records of a company
+
+        A transaction-level advisory lock ensures that two transactions never
+        process the same shard, hence the same records, concurrently.
+        """
+        lock_name = "sale_automatic_workflow,{},{}".format(sale_workflow.id, company.id)
+        lock_key = zlib.crc32(lock_name.encode())
+        self.env.cr.execute("SELECT pg_try_advisory_xact_lock(%s)", (lock_key,))
+        if not self.env.cr.fetchone()[0]:
+            _logger.info(
+                "Workflow %s for company %s is already processed by another "
+                "transaction, skipping.",
+                sale_workflow.name,
+                company.name,
+            )
+            return False
+        self.with_company(company).with_context(
+            auto_workflow_company_id=company.id
+        ).run_with_workflow(sale_workflow)
+        return True
+
+    def _run_shard_in_new_transaction(self, workflow_id, company_id):
+        """Run a shard in its own cursor, called from a worker thread"""
+        registry = self.env.registry
+        threading.current_thread().dbname = registry.db_name
+        try:
+            with registry.cursor() as cr:
+                env = api.Environment(cr, self.env.uid, self.env.context)
+                env["automatic.workflow.job"]._run_shard(
+                    env["sale.workflow.process"].browse(workflow_id),
+                    env["res.company"].browse(company_id),
+                )
+        except Exception:
+            _logger.exception(
+                "Error during the automatic workflow %s for company %s.",
+                workflow_id,
+                company_id,
+            )
+
+    @api.model
+    def run_sharded(self, workers=None):
+        """Must be called from ir.cron
+
+        Split the work by workflow and company, and process each shard in its
+        own transaction with a pool of ``workers`` threads. The number of
+        workers defaults to the ``sale_automatic_workflow.shard_workers``
+        system parameter.
+        """
+        if workers is None:
+            workers = int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("sale_automatic_workflow.shard_workers", 1)
+            )
+        pending_model = self.env["automatic.workflow.pending"]
+        last_pending_id = pending_model._get_last_id()
+        shards = [
+            (sale_workflow.id, company.id)
+            for sale_workflow in self.env["sale.workflow.process"].search([])
+            for company in self.env["res.company"].search([])
+        ]
+        if workers <= 1 or self.env.registry.in_test_mode():
+            # new cursors cannot be used in tests, stay in the current one
+            for workflow_id, company_id in shards:
+                self._run_shard(
+                    self.env["sale.workflow.process"].browse(workflow_id),
+                    self.env["res.company"].browse(company_id),
+                )
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for workflow_id, company_id in shards:
+                    executor.submit(
+                        self._run_shard_in_new_transaction, workflow_id, company_id
+                    )
+        pending_model._clear(last_pending_id)
         return True
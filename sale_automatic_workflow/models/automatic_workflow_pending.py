@@ -0,0 +1,86 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models, tools
+
+
+class AutomaticWorkflowPending(models.Model):
+    """Records modified since the last run of the automatic workflows
+
+    Workflows in incremental mode only evaluate their filters on these
+    records instead of rescanning the whole domain.
+    """
+
+    _name = "automatic.workflow.pending"
+    _description = "Automatic Workflow Pending Record"
+    _log_access = False
+
+    res_model = fields.Char(required=True, index=True)
+    res_id = fields.Integer(required=True)
+
+    @api.model
+    def _get_tracked_fields(self):
+        """Fields which may change whether a record is processed by a
+        workflow, per model"""
+        return {
+            "sale.order": {
+                "state",
+                "invoice_status",
+                "delivery_status",
+                "workflow_process_id",
+            },
+            "stock.picking": {"state", "workflow_process_id"},
+            "account.move": {
+                "state",
+                "payment_state",
+                "is_move_sent",
+                "workflow_process_id",
+            },
+        }
+
+    @api.model
+    @tools.ormcache()
+    def _is_enabled(self):
+        return bool(
+            self.env["sale.workflow.process"]
+            .sudo()
+            .with_context(active_test=False)
+            .search_count([("incremental_mode", "=", True)])
+        )
+
+    @api.model
+    def _add_records(self, records, fnames=None):
+        """Register records as pending, when one of ``fnames`` is tracked"""
+        if not records or not self._is_enabled():
+            return
+        if fnames is not None and not (
+            set(fnames) & self._get_tracked_fields().get(records._name, set())
+        ):
+            return
+        # called when the records are flushed: stay away from the ORM
+        self.env.cr.execute(
+            "INSERT INTO automatic_workflow_pending (res_model, res_id) "
+            "SELECT %s, unnest(%s)",
+            (records._name, list(records.ids)),
+        )
+
+    @api.model
+    def _get_pending_ids(self, model_name):
+        self.env.cr.execute(
+            "SELECT DISTINCT res_id FROM automatic_workflow_pending "
+            "WHERE res_model = %s",
+            (model_name,),
+        )
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _get_last_id(self):
+        self.env.cr.execute("SELECT max(id) FROM automatic_workflow_pending")
+        return self.env.cr.fetchone()[0] or 0
+
+    @api.model
+    def _clear(self, last_id):
+        """Forget the records registered up to ``last_id``, the ones
+        registered during a run are kept for the next one"""
+        self.env.cr.execute(
+            "DELETE FROM automatic_workflow_pending WHERE id <= %s", (last_id,)
+        )
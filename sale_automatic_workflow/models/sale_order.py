@@ -61,6 +61,19 @@ class SaleOrder(models.Model):
                     line.write({"qty_delivered": line.product_uom_qty})
         return super()._create_invoices(grouped=grouped, final=final, date=date)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        sales = super().create(vals_list)
+        self.env["automatic.workflow.pending"]._add_records(
+            sales.filtered("workflow_process_id")
+        )
+        return sales
+
+    def _write(self, vals):
+        res = super()._write(vals)
+        self.env["automatic.workflow.pending"]._add_records(self, vals)
+        return res
+
     def write(self, vals):
         if vals.get("state") == "sale" and vals.get("date_order"):
             sales_keep_order_date = self.filtered(
@@ -3,7 +3,8 @@
 # Copyright 2016 Sodexis
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
+from odoo.tools.safe_eval import safe_eval
 
 
 class SaleWorkflowProcess(models.Model):
@@ -19,6 +20,13 @@ class SaleWorkflowProcess(models.Model):
 
     _name = "sale.workflow.process"
     _description = "Sale Workflow Process"
+    _sql_constraints = [
+        (
+            "batch_size_positive",
+            "CHECK(batch_size > 0)",
+            "The batch size must be strictly positive.",
+        )
+    ]
 
     @api.model
     def _default_filter(self, xmlid):
@@ -48,6 +56,12 @@ class SaleWorkflowProcess(models.Model):
     create_invoice_filter_domain = fields.Text(
         string="Create Invoice Filter Domain", related="create_invoice_filter_id.domain"
     )
+    group_invoices = fields.Boolean(
+        help="When checked, the invoices of all the eligible orders are created "
+        "at once: the orders sharing the same invoice grouping keys (company, "
+        "partner, currency...) are invoiced together. If the creation fails, "
+        "the orders are invoiced one by one.",
+    )
     validate_invoice = fields.Boolean()
     validate_invoice_filter_domain = fields.Text(
         string="Validate Invoice Filter Domain",
@@ -59,6 +73,14 @@ class SaleWorkflowProcess(models.Model):
         related="send_invoice_filter_id.domain",
     )
     validate_picking = fields.Boolean(string="Confirm and Transfer Picking")
+    picking_create_backorder = fields.Boolean(
+        string="Create Backorders",
+        default=True,
+        help="In batch mode, the pickings which cannot be fully transferred "
+        "are validated with the available quantities. When checked, a "
+        "backorder is created for the remaining quantities, otherwise they "
+        "are cancelled.",
+    )
     picking_filter_domain = fields.Text(
         string="Picking Filter Domain", related="picking_filter_id.domain"
     )
@@ -142,3 +164,55 @@ class SaleWorkflowProcess(models.Model):
     payment_filter_domain = fields.Text(
         related="payment_filter_id.domain",
     )
+    batch_mode = fields.Boolean(
+        string="Process in Batch",
+        help="When checked, the records of each step are processed by chunks: "
+        "the filter is checked once per chunk and the action is executed on "
+        "the whole chunk. If a chunk fails, its records are processed again "
+        "one by one.",
+    )
+    incremental_mode = fields.Boolean(
+        help="When checked, the filters are only evaluated on the records "
+        "created or modified (state, invoice status, workflow...) since the "
+        "previous run of the scheduled action, instead of all the records. "
+        "Records which could not be processed are evaluated again on their "
+        "next modification.",
+    )
+    batch_size = fields.Integer(
+        default=500,
+        help="Maximum number of records processed at once in batch mode.",
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if any(vals.get("incremental_mode") for vals in vals_list):
+            self.clear_caches()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "incremental_mode" in vals:
+            self.clear_caches()
+        return res
+
+    def unlink(self):
+        incremental = any(self.mapped("incremental_mode"))
+        res = super().unlink()
+        if incremental:
+            self.clear_caches()
+        return res
+
+    @api.model
+    @tools.ormcache("domain")
+    def _eval_filter_domain(self, domain):
+        return tuple(safe_eval(domain))
+
+    def _get_filter_domain(self, filter_field):
+        """Return the evaluated domain of the filter in ``filter_field``
+
+        The evaluation is cached per domain.
+        """
+        self.ensure_one()
+        ir_filter = self[filter_field]
+        return list(self._eval_filter_domain(ir_filter.domain))
@@ -0,0 +1,97 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+
+class SaleWorkflowRun(models.Model):
+    """Statistics of a step of an automatic workflow, for one run of the
+    scheduled action"""
+
+    _name = "sale.workflow.run"
+    _description = "Sale Workflow Run"
+    _order = "date desc, id desc"
+
+    date = fields.Datetime(
+        required=True, readonly=True, index=True, default=fields.Datetime.now
+    )
+    workflow_process_id = fields.Many2one(
+        comodel_name="sale.workflow.process",
+        string="Automatic Workflow",
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete="cascade",
+    )
+    company_id = fields.Many2one(comodel_name="res.company", readonly=True)
+    step = fields.Selection(
+        selection=[
+            ("validate_order", "Validate Order"),
+            ("validate_picking", "Validate Picking"),
+            ("create_invoice", "Create Invoice"),
+            ("validate_invoice", "Validate Invoice"),
+            ("send_invoice", "Send Invoice"),
+            ("sale_done", "Sale Done"),
+            ("register_payment", "Register Payment"),
+        ],
+        required=True,
+        readonly=True,
+    )
+    candidate_count = fields.Integer(string="Candidates", readonly=True)
+    processed_count = fields.Integer(string="Processed", readonly=True)
+    bypassed_count = fields.Integer(string="Bypassed", readonly=True)
+    failed_count = fields.Integer(string="Failed", readonly=True)
+    enqueued_count = fields.Integer(
+        string="Enqueued",
+        readonly=True,
+        help="Records processed later by queue jobs, which log their own "
+        "statistics",
+    )
+    duration = fields.Float(string="Duration (s)", digits=(16, 3), readonly=True)
+    query_count = fields.Integer(string="SQL Queries", readonly=True)
+    latency_p50 = fields.Float(
+        string="Latency p50 (ms)",
+        digits=(16, 2),
+        group_operator="avg",
+        readonly=True,
+    )
+    latency_p95 = fields.Float(
+        string="Latency p95 (ms)",
+        digits=(16, 2),
+        group_operator="max",
+        readonly=True,
+    )
+
+    @api.model
+    def _log_step(self, sale_workflow, step, stats):
+        """Store the statistics of a workflow step, when it had records"""
+        if not stats.candidates:
+            return self.browse()
+        return self.sudo().create(
+            {
+                "workflow_process_id": sale_workflow.id,
+                "company_id": self.env.context.get("auto_workflow_company_id"),
+                "step": step,
+                "candidate_count": stats.candidates,
+                "processed_count": stats.processed,
+                "bypassed_count": stats.bypassed,
+                "failed_count": stats.failed,
+                "enqueued_count": stats.enqueued,
+                "duration": stats.duration,
+                "query_count": stats.query_count,
+                "latency_p50": stats.percentile(50) * 1000,
+                "latency_p95": stats.percentile(95) * 1000,
+            }
+        )
+
+    @api.autovacuum
+    def _gc_workflow_runs(self):
+        """Delete the statistics older than the retention period"""
+        retention_days = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("sale_automatic_workflow.run_retention_days", 30)
+        )
+        limit_date = fields.Datetime.now() - timedelta(days=retention_days)
+        self.sudo().search([("date", "<", limit_date)]).unlink()
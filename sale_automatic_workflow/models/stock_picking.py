@@ -3,7 +3,7 @@
 # Copyright 2016 Sodexis
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models
+from odoo import api, fields, models
 from odoo.tools import float_compare
 
 
@@ -14,23 +14,52 @@ class StockPicking(models.Model):
         comodel_name="sale.workflow.process", string="Sale Workflow Process"
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        pickings = super().create(vals_list)
+        self.env["automatic.workflow.pending"]._add_records(
+            pickings.filtered("workflow_process_id")
+        )
+        return pickings
+
+    def _write(self, vals):
+        res = super()._write(vals)
+        self.env["automatic.workflow.pending"]._add_records(self, vals)
+        return res
+
+    def _auto_fill_quantities(self):
+        """Reserve the pickings and set the done quantities of their moves"""
+        self.action_assign()
+        for move in self.move_ids.filtered(
+            lambda m: m.state not in ["done", "cancel"]
+        ):
+            rounding = move.product_id.uom_id.rounding
+            if (
+                float_compare(
+                    move.quantity_done,
+                    move.product_qty,
+                    precision_rounding=rounding,
+                )
+                == -1
+            ):
+                for move_line in move.move_line_ids:
+                    move_line.qty_done = move_line.reserved_uom_qty
+
     def validate_picking(self):
         """Set quantities automatically and validate the pickings."""
         for picking in self:
-            picking.action_assign()
-            for move in picking.move_ids.filtered(
-                lambda m: m.state not in ["done", "cancel"]
-            ):
-                rounding = move.product_id.uom_id.rounding
-                if (
-                    float_compare(
-                        move.quantity_done,
-                        move.product_qty,
-                        precision_rounding=rounding,
-                    )
-                    == -1
-                ):
-                    for move_line in move.move_line_ids:
-                        move_line.qty_done = move_line.reserved_uom_qty
+            picking._auto_fill_quantities()
             picking.with_context(skip_immediate=True, skip_sms=True).button_validate()
         return True
+
+    def validate_pickings_batch(self, create_backorder=True):
+        """Set quantities automatically and validate the pickings at once.
+
+        The backorder wizard is skipped: the remaining quantities are moved
+        to a backorder, or cancelled when ``create_backorder`` is False.
+        """
+        self._auto_fill_quantities()
+        ctx = {"skip_immediate": True, "skip_sms": True, "skip_backorder": True}
+        if not create_backorder:
+            ctx["picking_ids_not_to_backorder"] = self.ids
+        return self.with_context(**ctx).button_validate()
@@ -7,6 +7,7 @@ from unittest import mock
 from freezegun import freeze_time
 
 from odoo import fields
+from odoo.exceptions import UserError
 from odoo.tests import tagged
 from odoo.tools.safe_eval import safe_eval
 
@@ -254,3 +255,139 @@ class TestAutomaticWorkflow(TestCommon, TestAutomaticWorkflowMixin):
         self.assertIn("job bypassed", res_create_invoice)
         self.assertIn("job bypassed", res_validate_invoice)
         self.assertIn("job bypassed", res_send_invoice)
+
+    def test_full_automatic_batch_mode(self):
+        workflow = self.create_full_automatic(
+            override={"batch_mode": True, "batch_size": 1}
+        )
+        sales = self.create_sale_order(workflow) | self.create_sale_order(workflow)
+        self.run_job()
+        self.assertEqual(sales.mapped("state"), ["sale", "sale"])
+        invoices = sales.invoice_ids
+        self.assertEqual(len(invoices), 2)
+        self.assertEqual(invoices.mapped("state"), ["posted", "posted"])
+
+    def test_send_invoices_batch_mode(self):
+        workflow = self.create_full_automatic(override={"batch_mode": True})
+        sales = self.create_sale_order(workflow) | self.create_sale_order(workflow)
+        self.env.company.invoice_is_email = True
+        self.run_job()
+        invoices = sales.invoice_ids
+        self.assertEqual(invoices.mapped("is_move_sent"), [True, True])
+        mails = self.env["mail.mail"].search(
+            [("model", "=", "account.move"), ("res_id", "in", invoices.ids)]
+        )
+        self.assertEqual(set(mails.mapped("res_id")), set(invoices.ids))
+        # the emails are left to the mail queue
+        self.assertEqual(set(mails.mapped("state")), {"outgoing"})
+        # and posted on the invoices like in the single mode
+        for invoice in invoices:
+            self.assertTrue(
+                invoice.message_ids.filtered(
+                    lambda x: x.subtype_id == self.env.ref("mail.mt_comment")
+                )
+            )
+
+    def test_validate_pickings_batch_mode(self):
+        workflow = self.create_full_automatic(override={"batch_mode": True})
+        sales = self.create_sale_order(workflow) | self.create_sale_order(workflow)
+        picking_model = type(self.env["stock.picking"])
+        with mock.patch.object(
+            picking_model,
+            "validate_pickings_batch",
+            autospec=True,
+            side_effect=picking_model.validate_pickings_batch,
+        ) as mocked:
+            self.run_job()
+        # both pickings share the same operation type
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual(sales.picking_ids.mapped("state"), ["done", "done"])
+
+    def test_batch_mode_fallback(self):
+        workflow = self.create_full_automatic(override={"batch_mode": True})
+        sales = self.create_sale_order(workflow) | self.create_sale_order(workflow)
+        job_model = type(self.env["automatic.workflow.job"])
+        with mock.patch.object(
+            job_model,
+            "_do_validate_sale_orders_batch",
+            side_effect=UserError("Batch failure"),
+        ) as mocked:
+            self.run_job()
+        mocked.assert_called()
+        # the failing chunk has been processed record by record
+        self.assertEqual(sales.mapped("state"), ["sale", "sale"])
+
+    def test_group_invoices(self):
+        workflow = self.create_full_automatic(override={"group_invoices": True})
+        sale = self.create_sale_order(workflow)
+        sales = sale | self.create_sale_order(
+            workflow, override={"partner_id": sale.partner_id.id}
+        )
+        other_sale = self.create_sale_order(workflow)
+        self.run_job()
+        # orders of the same partner share a single invoice
+        self.assertEqual(len(sales.invoice_ids), 1)
+        self.assertEqual(sales.invoice_ids.state, "posted")
+        self.assertEqual(len(other_sale.invoice_ids), 1)
+        self.assertNotEqual(other_sale.invoice_ids, sales.invoice_ids)
+
+    def test_register_payment_batch_mode(self):
+        workflow = self.create_full_automatic(
+            override={"batch_mode": True, "register_payment": True}
+        )
+        sale = self.create_sale_order(workflow)
+        sales = sale | self.create_sale_order(
+            workflow, override={"partner_id": sale.partner_id.id}
+        )
+        self.run_job()
+        invoices = sales.invoice_ids
+        self.assertEqual(len(invoices), 2)
+        self.assertEqual(invoices.mapped("payment_state"), ["paid", "paid"])
+
+    def test_filter_domain_cache(self):
+        workflow = self.create_full_automatic()
+        order_filter = workflow.order_filter_id
+        self.assertEqual(
+            workflow._get_filter_domain("order_filter_id"),
+            safe_eval(order_filter.domain),
+        )
+        order_filter.domain = "[('state', '=', 'sent')]"
+        self.assertEqual(
+            workflow._get_filter_domain("order_filter_id"), [("state", "=", "sent")]
+        )
+
+    def test_incremental_mode(self):
+        workflow = self.create_full_automatic(override={"incremental_mode": True})
+        sale = self.create_sale_order(workflow)
+        pending_model = self.env["automatic.workflow.pending"]
+        self.assertIn(sale.id, pending_model._get_pending_ids("sale.order"))
+        self.run_job()
+        self.assertEqual(sale.state, "sale")
+        self.assertEqual(sale.invoice_ids.state, "posted")
+        # an order modified outside of the pending table is ignored
+        pending_model._clear(pending_model._get_last_id())
+        other_sale = self.create_sale_order(workflow)
+        pending_model._clear(pending_model._get_last_id())
+        self.run_job()
+        self.assertEqual(other_sale.state, "draft")
+        other_sale.workflow_process_id = self.create_full_automatic(
+            override={"incremental_mode": True}
+        )
+        other_sale.flush_recordset()
+        self.run_job()
+        self.assertEqual(other_sale.state, "sale")
+
+    def test_workflow_run_stats(self):
+        workflow = self.create_full_automatic()
+        self.create_sale_order(workflow)
+        self.create_sale_order(workflow)
+        self.run_job()
+        runs = self.env["sale.workflow.run"].search(
+            [("workflow_process_id", "=", workflow.id)]
+        )
+        validate_run = runs.filtered(lambda run: run.step == "validate_order")
+        self.assertEqual(validate_run.candidate_count, 2)
+        self.assertEqual(validate_run.processed_count, 2)
+        self.assertFalse(validate_run.failed_count)
+        self.assertTrue(validate_run.query_count)
+        self.assertTrue(runs.filtered(lambda run: run.step == "create_invoice"))
@@ -197,3 +197,19 @@ class TestMultiCompany(TestCommon):
         self.assertEqual(
             invoice_fr_daughter.journal_id.company_id, order_fr_daughter.company_id
         )
+
+    def test_sale_order_multicompany_sharded(self):
+        order_fr = self.create_auto_wkf_order(
+            self.company_fr, self.customer_fr, self.product_fr, 5
+        )
+        order_ch = self.create_auto_wkf_order(
+            self.company_ch, self.customer_ch, self.product_ch, 10
+        )
+        job = self.env["automatic.workflow.job"]
+        job._run_shard(self.auto_wkf, self.company_fr)
+        self.assertEqual(order_fr.state, "sale")
+        self.assertEqual(order_ch.state, "draft")
+        job.run_sharded(workers=2)
+        self.assertEqual(order_ch.state, "sale")
+        self.assertEqual(order_ch.invoice_ids.state, "posted")
+        self.assertEqual(order_ch.invoice_ids.journal_id.company_id, self.company_ch)
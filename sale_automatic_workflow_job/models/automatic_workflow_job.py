@@ -1,8 +1,11 @@
 # Copyright 2020 Camptocamp (https://www.camptocamp.com)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from contextlib import contextmanager
+
 from odoo import _, models
+from odoo.tools import split_every
 
-from odoo.addons.queue_job.job import identity_exact
+from odoo.addons.queue_job.job import Job, identity_exact
 
 
 class AutomaticWorkflowJob(models.Model):
@@ -69,14 +72,137 @@ class AutomaticWorkflowJob(models.Model):
         with_context = self.with_context(auto_delay_do_sale_done=True)
         return super(AutomaticWorkflowJob, with_context)._sale_done(domain_filter)
 
-    def _register_hook(self):
-        mapping = {
+    def _job_prepare_context_before_enqueue_keys(self):
+        # the workflow options and step must be kept in the chunk jobs
+        return super()._job_prepare_context_before_enqueue_keys() + (
+            "auto_workflow_batch_size",
+            "auto_workflow_group_invoices",
+            "auto_workflow_picking_backorder",
+            "auto_workflow_company_id",
+            "auto_workflow_process_id",
+            "auto_workflow_step",
+        )
+
+    @contextmanager
+    def _collect_step_stats(self, sale_workflow, step):
+        # the chunk jobs log their statistics in the step of the workflow
+        with_context = self.with_context(
+            auto_workflow_process_id=sale_workflow.id, auto_workflow_step=step
+        )
+        with super(AutomaticWorkflowJob, with_context)._collect_step_stats(
+            sale_workflow, step
+        ) as step_job:
+            yield step_job
+
+    def _add_stats(self, results, duration):
+        # the delayed records are counted as enqueued, their jobs log the
+        # statistics of their processing
+        jobs = [result for result in results if isinstance(result, Job)]
+        stats = self.env.context.get("auto_workflow_stats")
+        if jobs and stats is not None:
+            stats.enqueued += sum(len(job.args[0]) for job in jobs)
+        return super()._add_stats(
+            [result for result in results if not isinstance(result, Job)], duration
+        )
+
+    def _process_chunk_job_options(
+        self, records, domain_filter, method_name, batch_method_name=None
+    ):
+        description = _("Automatic workflow {} on {} records").format(
+            method_name, len(records)
+        )
+        return {
+            "description": description,
+            "identity_key": identity_exact,
+        }
+
+    def _process_chunk(
+        self, records, domain_filter, method_name, batch_method_name=None
+    ):
+        """Process a chunk of records in a job
+
+        The result of the job reports the result of each record, including
+        the failures. The statistics of the chunk are logged in the step of
+        the workflow which enqueued it.
+        """
+        sale_workflow = self.env["sale.workflow.process"].browse(
+            self.env.context.get("auto_workflow_process_id")
+        )
+        step = self.env.context.get("auto_workflow_step")
+        if not sale_workflow or not step:
+            results = super()._process_records(
+                records, domain_filter, method_name, batch_method_name=batch_method_name
+            )
+        else:
+            with self._collect_step_stats(sale_workflow, step) as chunk_job:
+                results = super(AutomaticWorkflowJob, chunk_job)._process_records(
+                    records,
+                    domain_filter,
+                    method_name,
+                    batch_method_name=batch_method_name,
+                )
+        return "\n".join(str(result) for result in results)
+
+    def _process_records(
+        self, records, domain_filter, method_name, batch_method_name=None
+    ):
+        """Enqueue one job per chunk of records
+
+        Only when the action is delayed and the workflow has a job chunk size
+        greater than 1 or processes the records in batch, otherwise one job
+        per record is created by the patched ``_do_*`` methods. In batch mode,
+        the chunks default to the batch size of the workflow.
+        """
+        chunk_size = self.env.context.get("auto_workflow_job_chunk_size") or 1
+        context_key = self._get_auto_delay_mapping().get(method_name)
+        if (
+            not context_key
+            or not self.env.context.get(context_key)
+            or (chunk_size <= 1 and not batch_method_name)
+        ):
+            return super()._process_records(
+                records, domain_filter, method_name, batch_method_name=batch_method_name
+            )
+        if batch_method_name and chunk_size <= 1:
+            chunk_size = self.env.context.get("auto_workflow_batch_size") or len(
+                records
+            )
+        jobs = []
+        for company in records.company_id:
+            company_records = records.filtered(lambda r: r.company_id == company)
+            for chunk in split_every(chunk_size, company_records.ids, records.browse):
+                chunk = chunk.with_company(company)
+                job_options = self._process_chunk_job_options(
+                    chunk, domain_filter, method_name, batch_method_name
+                )
+                jobs.append(
+                    self.with_delay(**job_options)._process_chunk(
+                        chunk, domain_filter, method_name, batch_method_name
+                    )
+                )
+        self._add_stats(jobs, 0.0)
+        return jobs
+
+    def run_with_workflow(self, sale_workflow):
+        with_context = self.with_context(
+            auto_workflow_job_chunk_size=sale_workflow.job_chunk_size
+        )
+        return super(AutomaticWorkflowJob, with_context).run_with_workflow(
+            sale_workflow
+        )
+
+    def _get_auto_delay_mapping(self):
+        """Methods executed in jobs, with the context key enabling the delay"""
+        return {
             "_do_validate_sale_order": "auto_delay_do_validation",
             "_do_create_invoice": "auto_delay_do_create_invoice",
             "_do_validate_invoice": "auto_delay_do_validation",
             "_do_validate_picking": "auto_delay_do_validation",
             "_do_sale_done": "auto_delay_do_sale_done",
         }
+
+    def _register_hook(self):
+        mapping = self._get_auto_delay_mapping()
         for method_name, context_key in mapping.items():
             self._patch_method(
                 method_name,
@@ -0,0 +1,13 @@
+# Copyright 2020 Camptocamp (https://www.camptocamp.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo import fields, models
+
+
+class SaleWorkflowProcess(models.Model):
+    _inherit = "sale.workflow.process"
+
+    job_chunk_size = fields.Integer(
+        default=1,
+        help="Number of records processed by each queue job. With the default "
+        "value of 1, one job is created per record and operation.",
+    )
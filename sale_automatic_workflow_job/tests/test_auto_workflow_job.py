@@ -136,3 +136,82 @@ class TestAutoWorkflowJob(TestCommon, TestAutomaticWorkflowMixin):
                 ],
             )
             self.assert_job_delayed(delayable_cls, delayable, "_do_sale_done", args)
+
+    def test_validate_sale_order_chunk(self):
+        workflow = self.create_full_automatic()
+        workflow.job_chunk_size = 10
+        sales = self.create_sale_order(workflow) | self.create_sale_order(workflow)
+        domain_filter = [
+            ("state", "=", "draft"),
+            ("workflow_process_id", "=", workflow.id),
+        ]
+        with mock_with_delay() as (delayable_cls, delayable):
+            self.run_job()  # run automatic workflow cron
+            # a single job for both orders
+            args = (sales, domain_filter, "_do_validate_sale_order", None)
+            self.assert_job_delayed(delayable_cls, delayable, "_process_chunk", args)
+
+    def test_process_chunk(self):
+        workflow = self.create_full_automatic()
+        sales = self.create_sale_order(workflow) | self.create_sale_order(workflow)
+        domain_filter = [
+            ("state", "=", "draft"),
+            ("workflow_process_id", "=", workflow.id),
+        ]
+        result = self.env["automatic.workflow.job"]._process_chunk(
+            sales, domain_filter, "_do_validate_sale_order"
+        )
+        self.assertEqual(sales.mapped("state"), ["sale", "sale"])
+        self.assertEqual(result.count("confirmed successfully"), 2)
+
+    def test_validate_sale_order_batch(self):
+        workflow = self.create_full_automatic()
+        workflow.write({"batch_mode": True, "batch_size": 10})
+        sales = self.create_sale_order(workflow) | self.create_sale_order(workflow)
+        domain_filter = [
+            ("state", "=", "draft"),
+            ("workflow_process_id", "=", workflow.id),
+        ]
+        with mock_with_delay() as (delayable_cls, delayable):
+            self.run_job()  # run automatic workflow cron
+            # the batch is processed in a job
+            args = (
+                sales,
+                domain_filter,
+                "_do_validate_sale_order",
+                "_do_validate_sale_orders_batch",
+            )
+            self.assert_job_delayed(delayable_cls, delayable, "_process_chunk", args)
+
+    def test_process_chunk_stats(self):
+        workflow = self.create_full_automatic()
+        sales = self.create_sale_order(workflow) | self.create_sale_order(workflow)
+        domain_filter = [
+            ("state", "=", "draft"),
+            ("workflow_process_id", "=", workflow.id),
+        ]
+        self.env["automatic.workflow.job"].with_context(
+            auto_workflow_process_id=workflow.id, auto_workflow_step="validate_order"
+        )._process_chunk(sales, domain_filter, "_do_validate_sale_order")
+        run = self.env["sale.workflow.run"].search(
+            [("workflow_process_id", "=", workflow.id)]
+        )
+        self.assertEqual(run.step, "validate_order")
+        self.assertEqual(run.candidate_count, 2)
+        self.assertEqual(run.processed_count, 2)
+
+    def test_validate_sale_order_chunk_stats(self):
+        workflow = self.create_full_automatic()
+        workflow.job_chunk_size = 10
+        self.create_sale_order(workflow)
+        self.create_sale_order(workflow)
+        self.run_job()  # run automatic workflow cron
+        # the delayed orders are not counted as processed by the cron
+        run = self.env["sale.workflow.run"].search(
+            [
+                ("workflow_process_id", "=", workflow.id),
+                ("step", "=", "validate_order"),
+            ]
+        )
+        self.assertEqual(run.enqueued_count, 2)
+        self.assertFalse(run.processed_count)
@@ -30,3 +30,16 @@ class AutomaticWorkflowJob(models.Model):
             )
             return
         return super()._register_payment_invoice(invoice)
+
+    def _register_payment_invoices(self, invoices):
+        without_journal = invoices.filtered(
+            lambda invoice: not invoice.payment_mode_id.fixed_journal_id
+        )
+        if without_journal:
+            _logger.debug(
+                "Unable to Register Payment for invoices %s: "
+                "Payment modes %s must have fixed journal",
+                without_journal.ids,
+                without_journal.payment_mode_id.ids,
+            )
+        return super()._register_payment_invoices(invoices - without_journal)
@@ -98,3 +98,33 @@ class TestAutomaticWorkflowPaymentMode(TestCommon, TestAutomaticWorkflowMixin):
         self.assertEqual(invoice.payment_state, "paid")
         picking = sale.picking_ids
         self.assertEqual(picking.state, "done")
+
+    def test_full_automatic_batch_mode(self):
+        workflow = self.create_full_automatic()
+        workflow.batch_mode = True
+        sale = self.create_sale_order(workflow)
+        sales = sale | self.create_sale_order(
+            workflow, override={"partner_id": sale.partner_id.id}
+        )
+        sales.payment_mode_id = self.pay_mode
+        self.pay_mode.write(
+            {"bank_account_link": "variable", "fixed_journal_id": False}
+        )
+        self.env["automatic.workflow.job"].run()
+        invoices = sales.invoice_ids
+        self.assertEqual(len(invoices), 2)
+        self.assertEqual(invoices.mapped("payment_state"), ["not_paid", "not_paid"])
+        # the invoices without fixed journal are not counted as paid
+        run = self.env["sale.workflow.run"].search(
+            [
+                ("workflow_process_id", "=", workflow.id),
+                ("step", "=", "register_payment"),
+            ]
+        )
+        self.assertEqual(run.processed_count, 0)
+        self.assertEqual(run.bypassed_count, 2)
+        self.pay_mode.write(
+            {"bank_account_link": "fixed", "fixed_journal_id": self.acc_journ.id}
+        )
+        self.env["automatic.workflow.job"].run()
+        self.assertEqual(invoices.mapped("payment_state"), ["paid", "paid"])
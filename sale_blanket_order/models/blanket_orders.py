@@ -1,13 +1,19 @@
 # Copyright 2018 ACSONE SA/NV
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import logging
+from collections import defaultdict
+
 from odoo import SUPERUSER_ID, _, api, fields, models
 from odoo.exceptions import UserError
-from odoo.tools import float_is_zero
+from odoo.tools import float_compare, float_is_zero, float_round
 from odoo.tools.misc import format_date
+from odoo.tools.sql import create_index
 
 from odoo.addons.sale.models.sale_order import READONLY_FIELD_STATES
 
+_logger = logging.getLogger(__name__)
+
 
 class BlanketOrder(models.Model):
     _name = "sale.blanket.order"
@@ -93,6 +99,7 @@ class BlanketOrder(models.Model):
     )
     validity_date = fields.Date(
         states=READONLY_FIELD_STATES,
+        index=True,
     )
     client_order_ref = fields.Char(
         string="Customer Reference",
@@ -138,35 +145,36 @@ class BlanketOrder(models.Model):
         string="Total", store=True, readonly=True, compute="_compute_amount_all"
     )
 
-    # Fields use to filter in tree view
+    # Totals of the lines, used to filter and group in tree view
     original_uom_qty = fields.Float(
         string="Original quantity",
         compute="_compute_uom_qty",
-        search="_search_original_uom_qty",
+        store=True,
         default=0.0,
     )
     ordered_uom_qty = fields.Float(
         string="Ordered quantity",
         compute="_compute_uom_qty",
-        search="_search_ordered_uom_qty",
+        store=True,
         default=0.0,
     )
     invoiced_uom_qty = fields.Float(
         string="Invoiced quantity",
         compute="_compute_uom_qty",
-        search="_search_invoiced_uom_qty",
+        store=True,
         default=0.0,
     )
     remaining_uom_qty = fields.Float(
         string="Remaining quantity",
         compute="_compute_uom_qty",
-        search="_search_remaining_uom_qty",
+        store=True,
+        index=True,
         default=0.0,
     )
     delivered_uom_qty = fields.Float(
         string="Delivered quantity",
         compute="_compute_uom_qty",
-        search="_search_delivered_uom_qty",
+        store=True,
         default=0.0,
     )
 
@@ -177,12 +185,39 @@ class BlanketOrder(models.Model):
     def _compute_line_count(self):
         self.line_count = len(self.mapped("line_ids"))
 
+    def _flush_sale_lines(self):
+        self.env["sale.blanket.order.line"].flush_model(["order_id"])
+        self.env["sale.order.line"].flush_model(
+            ["blanket_order_line", "order_id", "state"]
+        )
+
+    def _get_sale_order_counts(self):
+        """Return the number of sale orders of the blanket orders, computed
+        with one grouped query"""
+        order_ids = tuple(self.filtered("id").ids)
+        if not order_ids:
+            return {}
+        self._flush_sale_lines()
+        self.env.cr.execute(
+            """
+            SELECT bol.order_id,
+                COUNT(DISTINCT sol.order_id)
+            FROM sale_order_line sol
+            JOIN sale_blanket_order_line bol ON bol.id = sol.blanket_order_line
+            WHERE bol.order_id IN %s
+            GROUP BY bol.order_id
+            """,
+            (order_ids,),
+        )
+        return dict(self.env.cr.fetchall())
+
     def _compute_sale_count(self):
+        counts = self._get_sale_order_counts()
         for blanket_order in self:
-            blanket_order.sale_count = len(blanket_order._get_sale_orders())
+            blanket_order.sale_count = counts.get(blanket_order.id, 0)
 
     @api.depends(
-        "line_ids.remaining_uom_qty",
+        "remaining_uom_qty",
         "validity_date",
         "confirmed",
     )
@@ -194,27 +229,58 @@ class BlanketOrder(models.Model):
         for order in self:
             if not order.confirmed:
                 order.state = "draft"
-            elif order.validity_date <= today:
+            elif order.validity_date and order.validity_date <= today:
                 order.state = "expired"
-            elif float_is_zero(
-                sum(
-                    order.line_ids.filtered(lambda l: not l.display_type).mapped(
-                        "remaining_uom_qty"
-                    )
-                ),
-                precision_digits=precision,
-            ):
+            elif float_is_zero(order.remaining_uom_qty, precision_digits=precision):
                 order.state = "done"
             else:
                 order.state = "open"
 
+    @api.model
+    def _get_uom_qty_fields(self):
+        return [
+            "original_uom_qty",
+            "ordered_uom_qty",
+            "invoiced_uom_qty",
+            "delivered_uom_qty",
+            "remaining_uom_qty",
+        ]
+
+    @api.depends(
+        "line_ids.display_type",
+        "line_ids.original_uom_qty",
+        "line_ids.ordered_uom_qty",
+        "line_ids.invoiced_uom_qty",
+        "line_ids.delivered_uom_qty",
+        "line_ids.remaining_uom_qty",
+    )
     def _compute_uom_qty(self):
-        for bo in self:
-            bo.original_uom_qty = sum(bo.mapped("line_ids.original_uom_qty"))
-            bo.ordered_uom_qty = sum(bo.mapped("line_ids.ordered_uom_qty"))
-            bo.invoiced_uom_qty = sum(bo.mapped("line_ids.invoiced_uom_qty"))
-            bo.delivered_uom_qty = sum(bo.mapped("line_ids.delivered_uom_qty"))
-            bo.remaining_uom_qty = sum(bo.mapped("line_ids.remaining_uom_qty"))
+        qty_fields = self._get_uom_qty_fields()
+        # The totals of the saved orders are computed in one grouped query,
+        # the lines of the orders being edited are only in the cache
+        saved_orders = self.filtered("id")
+        totals = {}
+        if saved_orders:
+            groups = (
+                self.env["sale.blanket.order.line"]
+                .sudo()
+                ._read_group(
+                    [
+                        ("order_id", "in", saved_orders.ids),
+                        ("display_type", "=", False),
+                    ],
+                    qty_fields,
+                    ["order_id"],
+                )
+            )
+            for group in groups:
+                totals[group["order_id"][0]] = group
+        for bo in saved_orders:
+            group = totals.get(bo.id, {})
+            bo.update({fname: group.get(fname) or 0.0 for fname in qty_fields})
+        for bo in self - saved_orders:
+            lines = bo.line_ids.filtered(lambda l: not l.display_type)
+            bo.update({fname: sum(lines.mapped(fname)) for fname in qty_fields})
 
     @api.onchange("partner_id")
     def onchange_partner_id(self):
@@ -293,11 +359,23 @@ class BlanketOrder(models.Model):
         return True
 
     def _check_active_orders(self):
-        for order in self.filtered("sale_count"):
-            for so in order._get_sale_orders():
-                if so.state not in ("cancel"):
-                    return True
-        return False
+        order_ids = tuple(self.filtered("id").ids)
+        if not order_ids:
+            return False
+        self._flush_sale_lines()
+        self.env.cr.execute(
+            """
+            SELECT EXISTS(
+                SELECT 1
+                FROM sale_order_line sol
+                JOIN sale_blanket_order_line bol
+                    ON bol.id = sol.blanket_order_line
+                WHERE bol.order_id IN %s AND sol.state != 'cancel'
+            )
+            """,
+            (order_ids,),
+        )
+        return self.env.cr.fetchone()[0]
 
     def action_cancel(self):
         for order in self:
@@ -333,57 +411,43 @@ class BlanketOrder(models.Model):
 
     @api.model
     def expire_orders(self):
+        """Expire the open orders past their validity date
+
+        The state of the orders and of their lines is updated with one query
+        each, instead of recomputing the state of every order.
+        Return the number of expired orders.
+        """
         today = fields.Date.today()
-        expired_orders = self.search(
-            [("state", "=", "open"), ("validity_date", "<=", today)]
+        self.flush_model(["state", "validity_date"])
+        self.env["sale.blanket.order.line"].flush_model(["state"])
+        self.env.cr.execute(
+            """
+            UPDATE sale_blanket_order
+            SET state = 'expired'
+            WHERE state = 'open' AND validity_date <= %s
+            RETURNING id
+            """,
+            (today,),
         )
-        expired_orders.modified(["validity_date"])
-        expired_orders.flush_recordset()
-
-    @api.model
-    def _search_original_uom_qty(self, operator, value):
-        bo_line_obj = self.env["sale.blanket.order.line"]
-        res = []
-        bo_lines = bo_line_obj.search([("original_uom_qty", operator, value)])
-        order_ids = bo_lines.mapped("order_id")
-        res.append(("id", "in", order_ids.ids))
-        return res
-
-    @api.model
-    def _search_ordered_uom_qty(self, operator, value):
-        bo_line_obj = self.env["sale.blanket.order.line"]
-        res = []
-        bo_lines = bo_line_obj.search([("ordered_uom_qty", operator, value)])
-        order_ids = bo_lines.mapped("order_id")
-        res.append(("id", "in", order_ids.ids))
-        return res
-
-    @api.model
-    def _search_invoiced_uom_qty(self, operator, value):
-        bo_line_obj = self.env["sale.blanket.order.line"]
-        res = []
-        bo_lines = bo_line_obj.search([("invoiced_uom_qty", operator, value)])
-        order_ids = bo_lines.mapped("order_id")
-        res.append(("id", "in", order_ids.ids))
-        return res
-
-    @api.model
-    def _search_delivered_uom_qty(self, operator, value):
-        bo_line_obj = self.env["sale.blanket.order.line"]
-        res = []
-        bo_lines = bo_line_obj.search([("delivered_uom_qty", operator, value)])
-        order_ids = bo_lines.mapped("order_id")
-        res.append(("id", "in", order_ids.ids))
-        return res
-
-    @api.model
-    def _search_remaining_uom_qty(self, operator, value):
-        bo_line_obj = self.env["sale.blanket.order.line"]
-        res = []
-        bo_lines = bo_line_obj.search([("remaining_uom_qty", operator, value)])
-        order_ids = bo_lines.mapped("order_id")
-        res.append(("id", "in", order_ids.ids))
-        return res
+        expired_orders = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if not expired_orders:
+            return 0
+        self.env.cr.execute(
+            """
+            UPDATE sale_blanket_order_line
+            SET state = 'expired'
+            WHERE order_id IN %s
+            """,
+            (tuple(expired_orders.ids),),
+        )
+        expired_orders.invalidate_recordset(["state"])
+        self.env["sale.blanket.order.line"].invalidate_model(["state"])
+        body = _("Blanket order expired on %s") % format_date(self.env, today)
+        expired_orders._message_log_batch(
+            bodies={order.id: body for order in expired_orders}
+        )
+        _logger.info("%s blanket orders expired", len(expired_orders))
+        return len(expired_orders)
 
 
 class BlanketOrderLine(models.Model):
@@ -400,28 +464,54 @@ class BlanketOrderLine(models.Model):
         "currency_id",
     )
     def _compute_amount(self):
+        # The lines sharing the same taxes, price, quantity, currency, product
+        # and customer have the same amounts: they are computed only once,
+        # all together
+        lines_by_key = defaultdict(list)
         for line in self:
-            price = line.price_unit
-            taxes = line.taxes_id.compute_all(
-                price,
-                line.currency_id,
+            key = (
+                tuple(line.taxes_id.ids),
+                line.price_unit,
                 line.original_uom_qty,
-                product=line.product_id,
-                partner=line.order_id.partner_id,
-            )
-            line.update(
-                {
-                    "price_tax": sum(
-                        t.get("amount", 0.0) for t in taxes.get("taxes", [])
-                    ),
-                    "price_total": taxes["total_included"],
-                    "price_subtotal": taxes["total_excluded"],
-                }
+                line.currency_id.id,
+                line.product_id.id,
+                line.order_id.partner_id.id,
             )
+            lines_by_key[key].append(line)
+        lines_by_first = {lines[0]: lines for lines in lines_by_key.values()}
+        tax_results = self.env["account.tax"]._compute_taxes(
+            [line._convert_to_tax_base_line_dict() for line in lines_by_first]
+        )
+        for base_line, to_update in tax_results["base_lines_to_update"]:
+            price_subtotal = to_update["price_subtotal"]
+            price_total = to_update["price_total"]
+            for line in lines_by_first[base_line["record"]]:
+                line.update(
+                    {
+                        "price_tax": price_total - price_subtotal,
+                        "price_total": price_total,
+                        "price_subtotal": price_subtotal,
+                    }
+                )
+
+    def _convert_to_tax_base_line_dict(self):
+        """Convert the line to the dictionary used by the taxes computation"""
+        self.ensure_one()
+        return self.env["account.tax"]._convert_to_tax_base_line_dict(
+            self,
+            partner=self.order_id.partner_id,
+            currency=self.currency_id,
+            product=self.product_id,
+            taxes=self.taxes_id,
+            price_unit=self.price_unit,
+            quantity=self.original_uom_qty,
+        )
 
     name = fields.Char("Description", tracking=True)
     sequence = fields.Integer()
-    order_id = fields.Many2one("sale.blanket.order", required=True, ondelete="cascade")
+    order_id = fields.Many2one(
+        "sale.blanket.order", required=True, ondelete="cascade", index=True
+    )
     product_id = fields.Many2one(
         "product.product",
         string="Product",
@@ -465,8 +555,13 @@ class BlanketOrderLine(models.Model):
     company_id = fields.Many2one(
         related="order_id.company_id", store=True, index=True, precompute=True
     )
-    currency_id = fields.Many2one("res.currency", related="order_id.currency_id")
-    partner_id = fields.Many2one(related="order_id.partner_id", string="Customer")
+    currency_id = fields.Many2one(
+        "res.currency", related="order_id.currency_id", store=True, index=True
+    )
+    partner_id = fields.Many2one(
+        related="order_id.partner_id", string="Customer", store=True, index=True
+    )
+    state = fields.Selection(related="order_id.state", store=True, index=True)
     user_id = fields.Many2one(related="order_id.user_id", string="Responsible")
     payment_term_id = fields.Many2one(
         related="order_id.payment_term_id", string="Payment Terms"
@@ -484,6 +579,15 @@ class BlanketOrderLine(models.Model):
         help="Technical field for UX purpose.",
     )
 
+    def init(self):
+        # Index used to find the eligible lines of the sale order lines
+        create_index(
+            self.env.cr,
+            "sale_blanket_order_line_product_partner_state_index",
+            self._table,
+            ["product_id", "partner_id", "state"],
+        )
+
     def name_get(self):
         result = []
         if self.env.context.get("from_sale_order"):
@@ -634,28 +738,202 @@ class BlanketOrderLine(models.Model):
         "product_uom",
     )
     def _compute_quantities(self):
-        for line in self:
-            sale_lines = line.sale_lines
+        factors = {}
+        # The quantities of the saved lines are summed in one grouped query,
+        # the lines being edited are computed from the cache
+        saved_lines = self.filtered("id")
+        quantities = saved_lines._get_sale_lines_quantities(factors)
+        for line in saved_lines:
+            line.update(
+                quantities.get(
+                    line.id,
+                    {
+                        "ordered_uom_qty": 0.0,
+                        "invoiced_uom_qty": 0.0,
+                        "delivered_uom_qty": 0.0,
+                    },
+                )
+            )
+        for line in self - saved_lines:
+            sale_lines = line.sale_lines.filtered(
+                lambda sl: sl.order_id.state != "cancel"
+                and sl.product_id == line.product_id
+            )
             line.ordered_uom_qty = sum(
                 sl.product_uom._compute_quantity(sl.product_uom_qty, line.product_uom)
                 for sl in sale_lines
-                if sl.order_id.state != "cancel" and sl.product_id == line.product_id
             )
             line.invoiced_uom_qty = sum(
                 sl.product_uom._compute_quantity(sl.qty_invoiced, line.product_uom)
                 for sl in sale_lines
-                if sl.order_id.state != "cancel" and sl.product_id == line.product_id
             )
             line.delivered_uom_qty = sum(
                 sl.product_uom._compute_quantity(sl.qty_delivered, line.product_uom)
                 for sl in sale_lines
-                if sl.order_id.state != "cancel" and sl.product_id == line.product_id
             )
+        for line in self:
             line.remaining_uom_qty = line.original_uom_qty - line.ordered_uom_qty
-            line.remaining_qty = line.product_uom._compute_quantity(
-                line.remaining_uom_qty, line.product_id.uom_id
+            line.remaining_qty = self._convert_uom_qty(
+                line.remaining_uom_qty,
+                line.product_uom,
+                line.product_id.uom_id,
+                factors,
             )
 
+    def _get_sale_lines_quantities(self, factors):
+        """Sum the quantities of the sale lines of the blanket lines
+
+        The sale lines are grouped per blanket line, product and unit of
+        measure, then converted to the unit of measure of the blanket line.
+        """
+        quantities = {}
+        if not self:
+            return quantities
+        groups = (
+            self.env["sale.order.line"]
+            .sudo()
+            ._read_group(
+                [("blanket_order_line", "in", self.ids), ("state", "!=", "cancel")],
+                ["product_uom_qty", "qty_invoiced", "qty_delivered"],
+                ["blanket_order_line", "product_id", "product_uom"],
+                lazy=False,
+            )
+        )
+        lines = {line.id: line for line in self}
+        uoms = self.env["uom.uom"]
+        for group in groups:
+            line = lines[group["blanket_order_line"][0]]
+            product_id = group["product_id"] and group["product_id"][0]
+            if product_id != line.product_id.id:
+                continue
+            from_uom = uoms.browse(group["product_uom"] and group["product_uom"][0])
+            line_quantities = quantities.setdefault(
+                line.id,
+                {
+                    "ordered_uom_qty": 0.0,
+                    "invoiced_uom_qty": 0.0,
+                    "delivered_uom_qty": 0.0,
+                },
+            )
+            for fname, sale_fname in (
+                ("ordered_uom_qty", "product_uom_qty"),
+                ("invoiced_uom_qty", "qty_invoiced"),
+                ("delivered_uom_qty", "qty_delivered"),
+            ):
+                line_quantities[fname] += self._convert_uom_qty(
+                    group[sale_fname], from_uom, line.product_uom, factors
+                )
+        return quantities
+
+    @api.model
+    def _convert_uom_qty(self, qty, from_uom, to_uom, factors):
+        """Convert a quantity as ``uom.uom._compute_quantity`` does, the
+        conversion factors between the units being memoized in ``factors``"""
+        if not qty or not from_uom or not to_uom:
+            return qty
+        key = (from_uom.id, to_uom.id)
+        if key not in factors:
+            factors[key] = from_uom._compute_quantity(1.0, to_uom, round=False)
+        return float_round(
+            qty * factors[key],
+            precision_rounding=to_uom.rounding,
+            rounding_method="UP",
+        )
+
+    def _get_sale_order_grouping_key(self):
+        self.ensure_one()
+        return (
+            self.company_id.id,
+            self.partner_id.id,
+            self.currency_id.id,
+            self.pricelist_id.id,
+            self.payment_term_id.id,
+        )
+
+    def _prepare_sale_order_vals(self):
+        """Return the values of the sale order of lines sharing the same
+        grouping key"""
+        orders = self.order_id
+        return {
+            "partner_id": self[0].partner_id.id,
+            "company_id": self[0].company_id.id,
+            "origin": ", ".join(orders.mapped("name")),
+            "user_id": orders.user_id.id if len(orders.user_id) == 1 else False,
+            "currency_id": self[0].currency_id.id,
+            "pricelist_id": self[0].pricelist_id.id,
+            "payment_term_id": self[0].payment_term_id.id,
+            "analytic_account_id": orders.analytic_account_id.id
+            if len(orders.analytic_account_id) == 1
+            else False,
+            "order_line": [
+                (0, 0, line._prepare_sale_order_line_vals()) for line in self
+            ],
+        }
+
+    def _prepare_sale_order_line_vals(self, qty=None):
+        """Values of the sale order line of the given quantity, the remaining
+        quantity by default"""
+        self.ensure_one()
+        if qty is None:
+            qty = self.remaining_uom_qty
+        return {
+            "product_id": self.product_id.id,
+            "name": self.product_id.name,
+            "product_uom": self.product_uom.id,
+            "sequence": self.sequence,
+            "price_unit": self.price_unit,
+            "blanket_order_line": self.id,
+            "product_uom_qty": qty,
+            "tax_id": [(6, 0, self.taxes_id.ids)],
+        }
+
+    def _create_sale_orders(self):
+        """Create the sale orders of the remaining quantities of the lines
+
+        One sale order is created per company, customer, currency, pricelist
+        and payment terms, all of them at once.
+        """
+        precision = self.env["decimal.precision"].precision_get(
+            "Product Unit of Measure"
+        )
+        line_ids_by_key = defaultdict(list)
+        for line in self:
+            if line.display_type or (
+                float_compare(line.remaining_uom_qty, 0.0, precision_digits=precision)
+                <= 0
+            ):
+                continue
+            line_ids_by_key[line._get_sale_order_grouping_key()].append(line.id)
+        vals_list = [
+            self.browse(line_ids)._prepare_sale_order_vals()
+            for line_ids in line_ids_by_key.values()
+        ]
+        return self.env["sale.order"].create(vals_list)
+
+    @api.model
+    def _get_due_lines_domain(self, date_from, date_to):
+        domain = [
+            ("state", "=", "open"),
+            ("order_id.validity_date", ">", fields.Date.context_today(self)),
+            ("display_type", "=", False),
+            ("remaining_uom_qty", ">", 0.0),
+            ("date_schedule", "<=", date_to),
+        ]
+        if date_from:
+            domain.append(("date_schedule", ">=", date_from))
+        return domain
+
+    @api.model
+    def create_due_sale_orders(self, date_from=False, date_to=False):
+        """Create the sale orders of the open lines scheduled between the
+        given dates, until today by default"""
+        date_to = date_to or fields.Date.context_today(self)
+        lines = self.search(
+            self._get_due_lines_domain(date_from, date_to),
+            order="order_id, sequence, id",
+        )
+        return lines._create_sale_orders()
+
     def _validate(self):
         try:
             for line in self:
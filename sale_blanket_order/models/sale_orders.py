@@ -1,7 +1,7 @@
 # Copyright 2018 ACSONE SA/NV
 # Copyright 2019 Eficent and IT Consulting Services, S.L.
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
-from datetime import date, timedelta
+from datetime import date
 
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
@@ -55,54 +55,59 @@ class SaleOrderLine(models.Model):
         "sale.blanket.order.line", string="Blanket Order line", copy=False
     )
 
-    def _get_assigned_bo_line(self, bo_lines):
-        # We get the blanket order line with enough quantity and closest
-        # scheduled date
-        assigned_bo_line = False
-        date_planned = date.today()
-        date_delta = timedelta(days=365)
-        for line in bo_lines.filtered(lambda l: l.date_schedule):
-            date_schedule = line.date_schedule
-            if date_schedule and abs(date_schedule - date_planned) < date_delta:
-                assigned_bo_line = line
-                date_delta = abs(date_schedule - date_planned)
-        if assigned_bo_line:
-            return assigned_bo_line
-        non_date_bo_lines = bo_lines.filtered(lambda l: not l.date_schedule)
-        if non_date_bo_lines:
-            return non_date_bo_lines[0]
+    def _get_assigned_bo_line(self, domain):
+        # We get the blanket order line of the domain with the closest
+        # scheduled date, or else the first line without scheduled date,
+        # with one query
+        bo_line_obj = self.env["sale.blanket.order.line"]
+        query = bo_line_obj._where_calc(domain)
+        bo_line_obj._apply_ir_rules(query, "read")
+        date_schedule = '"{}".date_schedule'.format(query.table)
+        today = date.today()
+        query.add_where(
+            f"({date_schedule} IS NULL OR abs({date_schedule} - %s) < %s)",
+            [today, 365],
+        )
+        query_str, params = query.select('"{}".id'.format(query.table))
+        self.env.cr.execute(
+            f"{query_str} ORDER BY abs({date_schedule} - %s) NULLS LAST, "
+            f'"{query.table}".id LIMIT 1',
+            params + [today],
+        )
+        row = self.env.cr.fetchone()
+        if row:
+            return bo_line_obj.browse(row[0])
 
     def _get_eligible_bo_lines_domain(self, base_qty):
         filters = [
             ("product_id", "=", self.product_id.id),
             ("remaining_qty", ">=", base_qty),
             ("currency_id", "=", self.order_id.currency_id.id),
-            ("order_id.state", "=", "open"),
+            ("state", "=", "open"),
         ]
         if self.order_id.partner_id:
             filters.append(("partner_id", "=", self.order_id.partner_id.id))
         return filters
 
-    def _get_eligible_bo_lines(self):
+    def _get_eligible_bo_lines_base_domain(self):
         base_qty = self.product_uom._compute_quantity(
             self.product_uom_qty, self.product_id.uom_id
         )
-        filters = self._get_eligible_bo_lines_domain(base_qty)
+        return self._get_eligible_bo_lines_domain(base_qty)
+
+    def _get_eligible_bo_lines(self):
+        filters = self._get_eligible_bo_lines_base_domain()
         return self.env["sale.blanket.order.line"].search(filters)
 
     def get_assigned_bo_line(self):
         self.ensure_one()
-        eligible_bo_lines = self._get_eligible_bo_lines()
-        if eligible_bo_lines:
-            if (
-                not self.blanket_order_line
-                or self.blanket_order_line not in eligible_bo_lines
-            ):
-                self.blanket_order_line = self._get_assigned_bo_line(eligible_bo_lines)
-        else:
-            self.blanket_order_line = False
+        filters = self._get_eligible_bo_lines_base_domain()
+        # the current line is kept while it is eligible, without searching
+        # all the eligible lines
+        if not self.blanket_order_line.filtered_domain(filters):
+            self.blanket_order_line = self._get_assigned_bo_line(filters)
         self.onchange_blanket_order_line()
-        return {"domain": {"blanket_order_line": [("id", "in", eligible_bo_lines.ids)]}}
+        return {"domain": {"blanket_order_line": filters}}
 
     @api.onchange("product_id", "order_partner_id")
     def onchange_product_id(self):
@@ -160,6 +160,12 @@ class TestSaleBlanketOrders(common.TransactionCase):
         wizard1.line_ids[0].write({"qty": 10.0})
         wizard1.sudo().create_sale_order()
 
+        # the validity date is not required on the open blanket orders
+        self.env.cr.execute(
+            "UPDATE sale_blanket_order SET validity_date = NULL WHERE id = %s",
+            (blanket_order.id,),
+        )
+        blanket_order.invalidate_recordset(["validity_date"])
         wizard2 = self.blanket_order_wiz_obj.with_context(
             active_id=blanket_order.id, active_model="sale.blanket.order"
         ).create({})
@@ -227,6 +233,14 @@ class TestSaleBlanketOrders(common.TransactionCase):
         self.assertEqual(bo_lines[0].remaining_uom_qty, 10.0)
         self.assertEqual(bo_lines[1].remaining_uom_qty, 30.0)
 
+        self.assertEqual(blanket_order.original_uom_qty, 70.0)
+        self.assertEqual(blanket_order.ordered_uom_qty, 30.0)
+        self.assertEqual(blanket_order.remaining_uom_qty, 40.0)
+        orders = self.blanket_order_obj.search([("remaining_uom_qty", "=", 40.0)])
+        self.assertIn(blanket_order, orders)
+        orders = self.blanket_order_obj.search([("ordered_uom_qty", "=", 20.0)])
+        self.assertNotIn(blanket_order, orders)
+
     def test_04_create_sale_order_add_blanket_order_line(self):
         """We create a blanket order and the separately we create
         a sale order and see if blanket order lines have been
@@ -424,3 +438,178 @@ class TestSaleBlanketOrders(common.TransactionCase):
         view_action = blanket_order.action_view_sale_orders()
         domain_ids = view_action["domain"][0][2]
         self.assertEqual(len(domain_ids), 3)
+
+    def test_07_blanket_order_line_quantities(self):
+        """The quantities of the lines are summed from the sale lines,
+        converted to the unit of measure of the blanket order line"""
+        blanket_order = self.blanket_order_obj.create(
+            {
+                "partner_id": self.partner.id,
+                "validity_date": fields.Date.to_string(self.tomorrow),
+                "payment_term_id": self.payment_term.id,
+                "pricelist_id": self.sale_pricelist.id,
+                "line_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "product_id": self.product.id,
+                            "product_uom": self.uom_dozen.id,
+                            "original_uom_qty": 2.0,
+                            "price_unit": 240.0,
+                        },
+                    )
+                ],
+            }
+        )
+        blanket_order.sudo().onchange_partner_id()
+        blanket_order.sudo().action_confirm()
+        bo_line = blanket_order.line_ids
+        sale_orders = self.so_obj.create(
+            [
+                {
+                    "partner_id": self.partner.id,
+                    "pricelist_id": self.sale_pricelist.id,
+                    "order_line": [
+                        (
+                            0,
+                            0,
+                            {
+                                "product_id": self.product.id,
+                                "product_uom": self.product.uom_id.id,
+                                "product_uom_qty": qty,
+                                "price_unit": 20.0,
+                                "blanket_order_line": bo_line.id,
+                            },
+                        )
+                    ],
+                }
+                for qty in (6.0, 12.0)
+            ]
+        )
+        self.assertEqual(bo_line.ordered_uom_qty, 1.5)
+        self.assertEqual(bo_line.remaining_uom_qty, 0.5)
+        self.assertEqual(bo_line.remaining_qty, 6.0)
+        sale_orders[1]._action_cancel()
+        self.assertEqual(bo_line.ordered_uom_qty, 0.5)
+        self.assertEqual(bo_line.remaining_qty, 18.0)
+        self.assertEqual(blanket_order.remaining_uom_qty, 1.5)
+        self.assertEqual(blanket_order.sale_count, 2)
+        self.assertEqual(blanket_order._get_sale_order_counts(), {blanket_order.id: 2})
+        self.assertTrue(blanket_order._check_active_orders())
+        sale_orders[0]._action_cancel()
+        self.assertFalse(blanket_order._check_active_orders())
+
+    def test_08_create_due_sale_orders(self):
+        """The lines due of several blanket orders sharing the same customer,
+        currency, pricelist and payment terms are ordered together"""
+        blanket_orders = self.blanket_order_obj.create(
+            [
+                {
+                    "partner_id": self.partner.id,
+                    "validity_date": fields.Date.to_string(self.tomorrow),
+                    "payment_term_id": self.payment_term.id,
+                    "pricelist_id": self.sale_pricelist.id,
+                    "line_ids": [
+                        (
+                            0,
+                            0,
+                            {
+                                "product_id": product.id,
+                                "product_uom": product.uom_id.id,
+                                "original_uom_qty": 20.0,
+                                "price_unit": 30.0,
+                                "date_schedule": date_schedule,
+                            },
+                        )
+                        for date_schedule in (self.yesterday, self.tomorrow)
+                    ],
+                }
+                for product in (self.product, self.product2)
+            ]
+        )
+        blanket_orders.sudo().action_confirm()
+        sale_order = self.blanket_order_line_obj.create_due_sale_orders()
+        self.assertEqual(len(sale_order), 1)
+        self.assertEqual(sale_order.partner_id, self.partner)
+        self.assertEqual(sale_order.payment_term_id, self.payment_term)
+        due_lines = blanket_orders.line_ids.filtered(
+            lambda l: l.date_schedule == self.yesterday
+        )
+        self.assertEqual(sale_order.order_line.blanket_order_line, due_lines)
+        self.assertEqual(sale_order.order_line.mapped("product_uom_qty"), [20.0, 20.0])
+        self.assertEqual(due_lines.mapped("remaining_uom_qty"), [0.0, 0.0])
+        # nothing left to order
+        self.assertFalse(self.blanket_order_line_obj.create_due_sale_orders())
+
+    def test_09_expire_orders(self):
+        blanket_order = self.blanket_order_obj.create(
+            {
+                "partner_id": self.partner.id,
+                "validity_date": fields.Date.to_string(self.tomorrow),
+                "payment_term_id": self.payment_term.id,
+                "pricelist_id": self.sale_pricelist.id,
+                "line_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "product_id": self.product.id,
+                            "product_uom": self.product.uom_id.id,
+                            "original_uom_qty": 20.0,
+                            "price_unit": 30.0,
+                        },
+                    )
+                ],
+            }
+        )
+        blanket_order.sudo().action_confirm()
+        self.assertEqual(blanket_order.state, "open")
+        self.assertEqual(self.blanket_order_obj.expire_orders(), 0)
+        # the validity date is reached without recomputing the state
+        blanket_order.flush_recordset()
+        self.env.cr.execute(
+            "UPDATE sale_blanket_order SET validity_date = %s WHERE id = %s",
+            (self.yesterday, blanket_order.id),
+        )
+        blanket_order.invalidate_recordset(["validity_date"])
+        messages = blanket_order.message_ids
+        self.assertEqual(self.blanket_order_obj.expire_orders(), 1)
+        self.assertEqual(blanket_order.state, "expired")
+        self.assertEqual(blanket_order.line_ids.state, "expired")
+        blanket_order.invalidate_recordset(["message_ids"])
+        self.assertEqual(len(blanket_order.message_ids - messages), 1)
+
+    def test_10_blanket_order_amounts(self):
+        tax = self.env["account.tax"].create(
+            {"name": "Test Tax 15%", "amount": 15.0, "type_tax_use": "sale"}
+        )
+        blanket_order = self.blanket_order_obj.create(
+            {
+                "partner_id": self.partner.id,
+                "validity_date": fields.Date.to_string(self.tomorrow),
+                "payment_term_id": self.payment_term.id,
+                "pricelist_id": self.sale_pricelist.id,
+                "line_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "product_id": product.id,
+                            "product_uom": product.uom_id.id,
+                            "original_uom_qty": 10.0,
+                            "price_unit": 20.0,
+                            "taxes_id": [(6, 0, tax.ids)],
+                        },
+                    )
+                    for product in (self.product, self.product, self.product2)
+                ],
+            }
+        )
+        for line in blanket_order.line_ids:
+            self.assertEqual(line.price_subtotal, 200.0)
+            self.assertEqual(line.price_tax, 30.0)
+            self.assertEqual(line.price_total, 230.0)
+        self.assertEqual(blanket_order.amount_untaxed, 600.0)
+        self.assertEqual(blanket_order.amount_tax, 90.0)
+        self.assertEqual(blanket_order.amount_total, 690.0)
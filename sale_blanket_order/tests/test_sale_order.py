@@ -125,6 +125,8 @@ class TestSaleOrder(common.TransactionCase):
             [("order_id", "=", blanket_order.id)]
         )
         self.assertEqual(len(bo_lines), 2)
+        self.assertEqual(bo_lines.mapped("state"), ["open", "open"])
+        self.assertEqual(bo_lines.partner_id, self.partner)
 
         so = self.sale_order_obj.create(
             {
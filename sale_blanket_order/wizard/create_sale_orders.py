@@ -13,14 +13,18 @@ class BlanketOrderWizard(models.TransientModel):
 
     @api.model
     def _default_order(self):
-        # in case the cron hasn't run
-        self.env["sale.blanket.order"].expire_orders()
         if not self.env.context.get("active_id"):
             return False
         blanket_order = self.env["sale.blanket.order"].search(
             [("id", "=", self.env.context["active_id"])], limit=1
         )
-        if blanket_order.state == "expired":
+        # the orders are expired by the cron, check the validity date in
+        # case it hasn't run yet
+        if blanket_order.state == "expired" or (
+            blanket_order.state == "open"
+            and blanket_order.validity_date
+            and blanket_order.validity_date <= fields.Date.today()
+        ):
             raise UserError(
                 _("You can't create a sale order from " "an expired blanket order!")
             )
@@ -40,7 +44,13 @@ class BlanketOrderWizard(models.TransientModel):
             raise UserError(_("The sale has already been completed."))
 
         for line in bo_lines:
-            if line.order_id.state != "open":
+            if (
+                line.order_id.state != "open"
+                or (
+                    line.order_id.validity_date
+                    and line.order_id.validity_date <= fields.Date.today()
+                )
+            ):
                 raise UserError(
                     _("Sale Blanket Order %s is not open") % line.order_id.name
                 )
@@ -100,16 +110,7 @@ class BlanketOrderWizard(models.TransientModel):
     )
 
     def _prepare_so_line_vals(self, line):
-        return {
-            "product_id": line.product_id.id,
-            "name": line.product_id.name,
-            "product_uom": line.product_uom.id,
-            "sequence": line.blanket_line_id.sequence,
-            "price_unit": line.blanket_line_id.price_unit,
-            "blanket_order_line": line.blanket_line_id.id,
-            "product_uom_qty": line.qty,
-            "tax_id": [(6, 0, line.taxes_id.ids)],
-        }
+        return line.blanket_line_id._prepare_sale_order_line_vals(line.qty)
 
     def _prepare_so_vals(
         self,
@@ -1,4 +1,8 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+from . import ir_filters
+from . import product_product
+from . import product_template
 from . import sale_order
 from . import sale_order_picker
+from . import stock_move
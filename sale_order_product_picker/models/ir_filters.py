@@ -0,0 +1,30 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+from .sale_order import FILTER_VERSION_SEQUENCE
+
+
+class IrFilters(models.Model):
+    _inherit = "ir.filters"
+
+    def _increment_picker_filter_version(self):
+        # The cached picker products depend on the product filters
+        if "product.product" in self.mapped("model_id"):
+            self.env["sale.order"]._increment_picker_version(FILTER_VERSION_SEQUENCE)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        filters = super().create(vals_list)
+        filters._increment_picker_filter_version()
+        return filters
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {"domain", "action_id", "model_id"} & set(vals):
+            self._increment_picker_filter_version()
+        return res
+
+    def unlink(self):
+        self._increment_picker_filter_version()
+        return super().unlink()
@@ -0,0 +1,27 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+from .sale_order import PRODUCT_VERSION_SEQUENCE
+
+
+class ProductProduct(models.Model):
+    _inherit = "product.product"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        products = super().create(vals_list)
+        # The cached picker products depend on the existing products
+        self.env["sale.order"]._increment_picker_version(PRODUCT_VERSION_SEQUENCE)
+        return products
+
+    def write(self, vals):
+        res = super().write(vals)
+        if set(vals) & self.env["sale.order"]._get_picker_product_cache_fields():
+            self.env["sale.order"]._increment_picker_version(PRODUCT_VERSION_SEQUENCE)
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env["sale.order"]._increment_picker_version(PRODUCT_VERSION_SEQUENCE)
+        return res
@@ -0,0 +1,16 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import models
+
+from .sale_order import PRODUCT_VERSION_SEQUENCE
+
+
+class ProductTemplate(models.Model):
+    _inherit = "product.template"
+
+    def write(self, vals):
+        res = super().write(vals)
+        if set(vals) & self.env["sale.order"]._get_picker_product_cache_fields():
+            # The cached picker products depend on the template fields
+            self.env["sale.order"]._increment_picker_version(PRODUCT_VERSION_SEQUENCE)
+        return res
@@ -3,12 +3,23 @@
 # License AGPL-3 - See https://www.gnu.org/licenses/agpl-3.0.html
 
 from ast import literal_eval
+from collections import defaultdict
 from datetime import timedelta
 
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 from odoo.osv import expression
 from odoo.tools import float_compare
 
+# Versions of the data the cached picker products depend on
+PRODUCT_VERSION_SEQUENCE = "sale_order_product_picker_product_version_seq"
+FILTER_VERSION_SEQUENCE = "sale_order_product_picker_filter_version_seq"
+STOCK_VERSION_SEQUENCE = "sale_order_product_picker_stock_version_seq"
+PICKER_VERSION_SEQUENCES = (
+    PRODUCT_VERSION_SEQUENCE,
+    FILTER_VERSION_SEQUENCE,
+    STOCK_VERSION_SEQUENCE,
+)
+
 
 class SaleOrder(models.Model):
     _inherit = "sale.order"
@@ -47,6 +58,11 @@ class SaleOrder(models.Model):
     )
     product_name_search = fields.Char(string="Search product", store=False)
 
+    def init(self):
+        for sequence in PICKER_VERSION_SEQUENCES:
+            # pylint: disable=sql-injection
+            self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence}")
+
     @api.model
     def _list_product_picker_filters(self):
         action = self.env.ref(
@@ -83,13 +99,7 @@ class SaleOrder(models.Model):
             ("company_id", "=", self.company_id.id),
         ]
         if self.picker_only_available:
-            available_field = (
-                self.env["ir.config_parameter"]
-                .sudo()
-                .get_param(
-                    "sale_order_product_picker.product_available_field", "qty_available"
-                )
-            )
+            available_field = self._get_picker_available_field()
             domain = expression.AND([domain, [(available_field, ">", 0.0)]])
         if product_filter.domain:
             domain = expression.AND([domain, literal_eval(product_filter.domain)])
@@ -114,41 +124,212 @@ class SaleOrder(models.Model):
             )
         return domain
 
-    # TODO: Invalidate cache on product write if next line is uncommented
-    # @ormcache("self.partner_id", "self.picker_filter", "self.product_name_search")
-    def _get_picker_product_ids(self):
-        if not self.partner_id or not any(
+    def _has_picker_search_criteria(self):
+        return bool(self.partner_id) and any(
             self[f_name] for f_name in self._get_picker_trigger_search_fields()
-        ):
-            self.picker_ids = False
-            return None
+        )
+
+    def _get_picker_products(self, limit=None):
+        """Return the products matching the picker filters sorted by the picker
+        order, as a query to be used as subquery in domains, or as a list of
+        ids when they are searched by name."""
         Product = self.env["product.product"]
         domain = self._get_picker_product_domain()
         order = self.picker_order or None
-        if self.product_name_search:
-            product_ids = Product._name_search(self.product_name_search, args=domain)
-            # Research to sort _name_search ids instead of browse sorted
-            if order:
-                product_ids = Product.search(
-                    [("id", "in", product_ids)], order=order
-                ).ids
-        else:
-            product_ids = Product.search(domain, order=order).ids
-        return product_ids
+        if not self.product_name_search:
+            return Product._search(domain, limit=limit, order=order)
+        product_ids = Product._name_search(self.product_name_search, args=domain)
+        # Research to sort _name_search ids instead of browse sorted
+        if order:
+            product_ids = Product.search([("id", "in", product_ids)], order=order).ids
+        return list(product_ids)[:limit]
 
-    # TODO: Use field list instead overwrite method
-    def filter_picker_so_lines(self, picker_data):
-        return self.order_line.filtered(
-            lambda sol: sol.product_id.id == picker_data["product_id"][0]
+    def _get_picker_product_ids(self, limit=None):
+        """Ids of the products matching the picker filters, cached while the
+        products, the filters and the stock don't change.
+
+        The product domain can depend on the partner and the pricelist of the
+        order, but not on its lines.
+        """
+        if not self._has_picker_search_criteria():
+            return None
+        product_version, filter_version, stock_version = self._get_picker_versions()
+        filter_fields = self._get_picker_filters_fields(filter_version).get(
+            self.picker_filter, frozenset()
+        )
+        if not self._is_picker_product_search_cacheable(filter_fields):
+            return list(self._get_picker_products(limit=limit))
+        if not (self.picker_only_available or "qty_available" in filter_fields):
+            stock_version = 0
+        return list(
+            self._search_picker_product_ids(
+                self.company_id.id,
+                self.partner_id.id,
+                self.pricelist_id.id,
+                self.picker_filter,
+                self.picker_product_attribute_value_id.id,
+                self.picker_only_available,
+                self.product_name_search or "",
+                self.picker_order or "",
+                limit,
+                (product_version, filter_version, stock_version),
+            )
+        )
+
+    @api.model
+    @tools.ormcache(
+        "company_id",
+        "partner_id",
+        "pricelist_id",
+        "picker_filter",
+        "attribute_value_id",
+        "only_available",
+        "name_search",
+        "order",
+        "limit",
+        "versions",
+        "self.env.lang",
+        "tuple(self.env.companies.ids)",
+    )
+    def _search_picker_product_ids(
+        self,
+        company_id,
+        partner_id,
+        pricelist_id,
+        picker_filter,
+        attribute_value_id,
+        only_available,
+        name_search,
+        order,
+        limit,
+        versions,
+    ):
+        sale_order = self.new(
+            {
+                "company_id": company_id,
+                "partner_id": partner_id,
+                "pricelist_id": pricelist_id,
+                "picker_filter": picker_filter,
+                "picker_product_attribute_value_id": attribute_value_id,
+                "picker_only_available": only_available,
+                "product_name_search": name_search,
+                "picker_order": order,
+            }
+        )
+        return tuple(sale_order._get_picker_products(limit=limit))
+
+    def _get_picker_available_field(self):
+        return (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "sale_order_product_picker.product_available_field", "qty_available"
+            )
         )
 
+    def _is_picker_product_search_cacheable(self, filter_fields):
+        """Only the stored product fields and the on hand quantity, which
+        changes with the done stock moves, expire the cached products."""
+        if (
+            self.picker_only_available
+            and self._get_picker_available_field() != "qty_available"
+        ):
+            return False
+        Product = self.env["product.product"]
+        for fname in filter_fields:
+            field = Product._fields.get(fname)
+            if fname != "qty_available" and not (field and field.base_field.store):
+                return False
+        return True
+
+    @api.model
+    def _get_picker_versions(self):
+        """Versions of the products, the filters and the stock"""
+        # pylint: disable=sql-injection
+        self.env.cr.execute(
+            "SELECT {} FROM {}".format(
+                ", ".join(f"{seq}.last_value" for seq in PICKER_VERSION_SEQUENCES),
+                ", ".join(PICKER_VERSION_SEQUENCES),
+            )
+        )
+        return self.env.cr.fetchone()
+
+    @api.model
+    def _increment_picker_version(self, sequence):
+        """Expire the cached picker products without clearing the caches of
+        the registry
+
+        Sequences are not transactional, so the new version is seen at once
+        by the other workers, which could cache the products not committed
+        yet under it. The version is then incremented again after the
+        commit of the transaction.
+        """
+        cr = self.env.cr
+        cr.execute("SELECT nextval(%s)", (sequence,))
+        sequences = cr.postcommit.data.setdefault(
+            "sale_order_product_picker.versions", set()
+        )
+        if not sequences:
+            cr.postcommit.add(self._increment_picker_versions_postcommit)
+        sequences.add(sequence)
+
+    @api.model
+    def _increment_picker_versions_postcommit(self):
+        cr = self.env.cr
+        for sequence in cr.postcommit.data.pop(
+            "sale_order_product_picker.versions", set()
+        ):
+            cr.execute("SELECT nextval(%s)", (sequence,))
+
+    @api.model
+    @tools.ormcache("filter_version")
+    def _get_picker_filters_fields(self, filter_version):
+        """Product fields of the domain of each picker filter"""
+        filters_fields = {}
+        for filter_id, __ in self.sudo()._list_product_picker_filters():
+            domain = self.env["ir.filters"].sudo().browse(filter_id).domain or "[]"
+            filters_fields[filter_id] = frozenset(
+                leaf[0].split(".")[0]
+                for leaf in literal_eval(domain)
+                if expression.is_leaf(leaf)
+            )
+        return filters_fields
+
+    @api.model
+    def _get_picker_product_cache_fields(self):
+        """Product fields the cached picker products depend on"""
+        filters_fields = self._get_picker_filters_fields(self._get_picker_versions()[1])
+        return {
+            "active",
+            "attribute_line_ids",
+            "barcode",
+            "categ_id",
+            "company_id",
+            "default_code",
+            "name",
+            "product_template_attribute_value_ids",
+            "sale_ok",
+        }.union(*filters_fields.values())
+
+    def _get_picker_so_lines_by_product(self):
+        so_lines_by_product = defaultdict(lambda: self.env["sale.order.line"])
+        for so_line in self.order_line:
+            so_lines_by_product[so_line.product_id.id] |= so_line
+        return so_lines_by_product
+
+    # TODO: Use field list instead overwrite method
+    def filter_picker_so_lines(self, picker_data, so_lines_by_product=None):
+        if so_lines_by_product is None:
+            so_lines_by_product = self._get_picker_so_lines_by_product()
+        return so_lines_by_product[picker_data["product_id"][0]]
+
     @api.depends(
         lambda s: ["partner_id", "picker_order"] + s._get_picker_trigger_search_fields()
     )
     def _compute_picker_ids(self):
         for order in self:
-            product_ids = order._get_picker_product_ids()
-            if product_ids is None:
+            if not order._has_picker_search_criteria():
+                order.picker_ids = False
                 continue
             picker_data_list = getattr(
                 order,
@@ -156,9 +337,12 @@ class SaleOrder(models.Model):
                     order.picker_origin_data or "products"
                 ),
             )()
+            so_lines_by_product = order._get_picker_so_lines_by_product()
             picker_ids = self.env["sale.order.picker"].browse()
             for picker_data in picker_data_list:
-                so_lines = order.filter_picker_so_lines(picker_data)
+                so_lines = order.filter_picker_so_lines(
+                    picker_data, so_lines_by_product
+                )
                 picker_ids += order.picker_ids.new(
                     order._prepare_product_picker_vals(picker_data, so_lines)
                 )
@@ -181,17 +365,18 @@ class SaleOrder(models.Model):
         other_sales = (
             self.env["sale.order"]
             # .sudo()
-            .search(
+            ._search(
                 [
                     ("company_id", "=", self.company_id.id),
                     (sale_order_partner_field, "child_of", partner.id),
                     ("date_order", ">=", start),
+                    ("id", "!=", self._origin.id),
                 ]
             )
         )
         domain = [
-            ("order_id", "in", (other_sales - self).ids),
-            ("product_id", "in", self._get_picker_product_ids()),
+            ("order_id", "in", other_sales),
+            ("product_id", "in", self._get_picker_products()),
             ("qty_delivered", "!=", 0.0),
         ]
         return domain
@@ -214,7 +399,7 @@ class SaleOrder(models.Model):
     def _get_product_picker_data_products(self):
         limit = self._get_product_picker_limit()
         products = self.env["product.product"].browse(
-            self._get_picker_product_ids()[:limit]
+            self._get_picker_product_ids(limit=limit)
         )
         return [{"product_id": (p.id, p.name)} for p in products]
 
@@ -0,0 +1,16 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import models
+
+from .sale_order import STOCK_VERSION_SEQUENCE
+
+
+class StockMove(models.Model):
+    _inherit = "stock.move"
+
+    def _action_done(self, cancel_backorder=False):
+        moves = super()._action_done(cancel_backorder=cancel_backorder)
+        if moves:
+            # The on hand quantities of the cached picker products change
+            self.env["sale.order"]._increment_picker_version(STOCK_VERSION_SEQUENCE)
+        return moves
@@ -0,0 +1,81 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestSaleOrderProductPicker(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.partner = cls.env["res.partner"].create({"name": "Picker customer"})
+        cls.product_a, cls.product_b = cls.env["product.product"].create(
+            [
+                {
+                    "name": "Picker product A",
+                    "default_code": "PICK-A",
+                    "detailed_type": "product",
+                },
+                {
+                    "name": "Picker product B",
+                    "default_code": "PICK-B",
+                    "detailed_type": "product",
+                },
+            ]
+        )
+        cls.product_filter = cls.env["ir.filters"].create(
+            {
+                "name": "Picker products",
+                "model_id": "product.product",
+                "action_id": cls.env.ref(
+                    "sale_order_product_picker.product_normal_action_sell_picker"
+                ).id,
+                "domain": "[('default_code', 'like', 'PICK-A')]",
+                "user_id": False,
+            }
+        )
+        cls.order = cls.env["sale.order"].create({"partner_id": cls.partner.id})
+
+    def _get_picker_products(self, **values):
+        self.order.update(dict(values, picker_filter=self.product_filter.id))
+        return self.env["product.product"].browse(
+            self.order._get_picker_product_ids()
+        )
+
+    def test_picker_cache_product_write(self):
+        self.assertEqual(self._get_picker_products(), self.product_a)
+        self.product_b.default_code = "PICK-AB"
+        self.assertEqual(self._get_picker_products(), self.product_a + self.product_b)
+        self.product_a.sale_ok = False
+        self.assertEqual(self._get_picker_products(), self.product_b)
+
+    def test_picker_cache_filter_write(self):
+        self.assertEqual(self._get_picker_products(), self.product_a)
+        self.product_filter.domain = "[('default_code', '=', 'PICK-B')]"
+        self.assertEqual(self._get_picker_products(), self.product_b)
+
+    def test_picker_cache_stock_move(self):
+        self.assertFalse(self._get_picker_products(picker_only_available=True))
+        warehouse = self.env["stock.warehouse"].search(
+            [("company_id", "=", self.env.company.id)], limit=1
+        )
+        self.env["stock.quant"].with_context(inventory_mode=True).create(
+            {
+                "product_id": self.product_a.id,
+                "location_id": warehouse.lot_stock_id.id,
+                "inventory_quantity": 5,
+            }
+        ).action_apply_inventory()
+        self.assertEqual(
+            self._get_picker_products(picker_only_available=True), self.product_a
+        )
+
+    def test_picker_cache_postcommit(self):
+        self.assertEqual(self._get_picker_products(), self.product_a)
+        self.product_b.default_code = "PICK-AB"
+        version = self.order._get_picker_versions()[0]
+        # The products cached by another worker before the commit expire
+        self.env.cr.postcommit.run()
+        self.assertGreater(self.order._get_picker_versions()[0], version)
+        self.assertEqual(self._get_picker_products(), self.product_a + self.product_b)
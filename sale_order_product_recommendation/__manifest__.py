@@ -17,6 +17,7 @@
     ],
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "wizards/sale_order_recommendation_view.xml",
         "views/res_config_settings_views.xml",
         "views/sale_order_view.xml",
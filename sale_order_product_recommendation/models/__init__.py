@@ -1,3 +1,7 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 from . import res_company
 from . import res_config_settings
+from . import sale_order
+from . import sale_order_recommendation_cache
+from . import sale_order_recommendation_copurchase
+from . import sale_order_recommendation_stat
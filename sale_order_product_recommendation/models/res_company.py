@@ -9,3 +9,25 @@ class ResCompany(models.Model):
 
     force_zero_units_included = fields.Boolean()
     sale_line_recommendation_domain = fields.Char(default="[]")
+    sale_recommendation_use_stats = fields.Boolean(
+        string="Use precomputed recommendation statistics"
+    )
+    sale_recommendation_cache_hours = fields.Integer(
+        string="Recommendation cache hours"
+    )
+    sale_recommendation_copurchase_count = fields.Integer(
+        string="Co-purchased products to recommend"
+    )
+    sale_recommendation_copurchase_months = fields.Integer(
+        string="Co-purchase months", default=12
+    )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if vals.get("sale_recommendation_use_stats"):
+            self.env["sale.order.recommendation.stat"].sudo()._refresh(companies=self)
+        if vals.get("sale_recommendation_copurchase_count"):
+            self.env["sale.order.recommendation.copurchase"].sudo()._refresh(
+                companies=self
+            )
+        return res
@@ -37,3 +37,30 @@ class ResConfigSettings(models.TransientModel):
         readonly=False,
         help="Domain applied to find SO lines to propose as recommended products.",
     )
+    sale_recommendation_use_stats = fields.Boolean(
+        related="company_id.sale_recommendation_use_stats",
+        readonly=False,
+        help="Find the recommended products in statistics of the delivered "
+        "products per customer and month, maintained when the sale order lines "
+        "are delivered, instead of reading the sales history. They are not "
+        "used when a sale order product recommendation domain is set.",
+    )
+    sale_recommendation_cache_hours = fields.Integer(
+        related="company_id.sale_recommendation_cache_hours",
+        readonly=False,
+        help="Keep the recommended products found for a customer during these "
+        "hours, and find them in advance for the quotations every night. "
+        "Set 0 to always search them again.",
+    )
+    sale_recommendation_copurchase_count = fields.Integer(
+        related="company_id.sale_recommendation_copurchase_count",
+        readonly=False,
+        help="Recommend also these products bought by other customers along "
+        "with the products of the customer, computed every week. "
+        "Set 0 to disable them.",
+    )
+    sale_recommendation_copurchase_months = fields.Integer(
+        related="company_id.sale_recommendation_copurchase_months",
+        readonly=False,
+        help="Consider these months backwards to find the co-purchased products.",
+    )
@@ -0,0 +1,53 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+
+class SaleOrder(models.Model):
+    _inherit = "sale.order"
+
+    def _write(self, vals):
+        stat_fnames = {"company_id", "partner_id", "partner_shipping_id", "date_order"}
+        if not stat_fnames & set(vals):
+            return super()._write(vals)
+        stat_obj = self.env["sale.order.recommendation.stat"]
+        keys = stat_obj._get_stored_keys(order_ids=self.ids)
+        res = super()._write(vals)
+        keys |= stat_obj._get_stored_keys(order_ids=self.ids)
+        stat_obj._add_keys_to_refresh(keys)
+        return res
+
+
+class SaleOrderLine(models.Model):
+    _inherit = "sale.order.line"
+
+    def _get_recommendation_stat_keys(self):
+        """Return the keys of the recommendation statistics of the lines, as
+        stored in the database"""
+        return self.env["sale.order.recommendation.stat"]._get_stored_keys(
+            line_ids=self.ids
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        self.env["sale.order.recommendation.stat"]._add_keys_to_refresh(
+            lines._get_recommendation_stat_keys()
+        )
+        return lines
+
+    def _write(self, vals):
+        if not {"qty_delivered", "product_id", "order_id"} & set(vals):
+            return super()._write(vals)
+        keys = self._get_recommendation_stat_keys()
+        res = super()._write(vals)
+        keys |= self._get_recommendation_stat_keys()
+        self.env["sale.order.recommendation.stat"]._add_keys_to_refresh(keys)
+        return res
+
+    def unlink(self):
+        self.env.flush_all()
+        keys = self._get_recommendation_stat_keys()
+        res = super().unlink()
+        self.env["sale.order.recommendation.stat"]._add_keys_to_refresh(keys)
+        return res
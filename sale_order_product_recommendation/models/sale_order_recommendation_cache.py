@@ -0,0 +1,112 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+
+class SaleOrderRecommendationCache(models.Model):
+    """Delivered products of a customer found with some search criteria
+
+    The recommendation wizard reads them instead of searching the sales
+    history again while they are younger than the cache duration of the
+    company.
+    """
+
+    _name = "sale.order.recommendation.cache"
+    _description = "Sale order recommendation cache"
+    _log_access = False
+
+    company_id = fields.Many2one("res.company", required=True, readonly=True)
+    partner_id = fields.Many2one("res.partner", required=True, readonly=True)
+    use_delivery_address = fields.Boolean(readonly=True)
+    months = fields.Float(readonly=True)
+    domain_hash = fields.Char(
+        readonly=True, help="Hash of the sale order product recommendation domain"
+    )
+    date = fields.Datetime(string="As of", required=True, readonly=True)
+    found_lines = fields.Json(
+        readonly=True,
+        help="Delivered products sorted by times and units delivered, "
+        "in the format of a read_group on sale order lines",
+    )
+
+    def init(self):
+        create_index(
+            self.env.cr,
+            "sale_order_recommendation_cache_partner_index",
+            self._table,
+            ["company_id", "partner_id"],
+        )
+
+    @api.model
+    def _get_cache(self, wizard):
+        """Return the recommendations cached for the criteria of the wizard,
+        finding them again when they are missing or expired"""
+        key = wizard._get_recommendation_cache_key()
+        key_domain = [(field, "=", value) for field, value in key.items()]
+        hours = wizard.order_id.company_id.sale_recommendation_cache_hours
+        cache = self.search(
+            key_domain
+            + [("date", ">=", fields.Datetime.now() - timedelta(hours=hours))],
+            order="date desc",
+            limit=1,
+        )
+        if not cache:
+            self.search(key_domain).unlink()
+            cache = self.create(
+                dict(
+                    key,
+                    date=fields.Datetime.now(),
+                    found_lines=wizard._get_partner_found_lines(),
+                )
+            )
+        return cache
+
+    @api.autovacuum
+    def _gc_expired_cache(self):
+        """Remove the expired recommendations"""
+        expired = self.browse()
+        for company in self.env["res.company"].search([]):
+            hours = company.sale_recommendation_cache_hours
+            expired |= self.search(
+                [
+                    ("company_id", "=", company.id),
+                    ("date", "<", fields.Datetime.now() - timedelta(hours=hours)),
+                ]
+            )
+        expired.unlink()
+        _logger.info("GC'd %d expired sale order recommendations", len(expired))
+
+    @api.model
+    def _prewarm_orders_domain(self):
+        """Sale orders being prepared for the customers, whose recommendations
+        are found in advance"""
+        return [
+            ("company_id.sale_recommendation_cache_hours", ">", 0),
+            ("state", "in", ("draft", "sent")),
+        ]
+
+    @api.model
+    def _cron_prewarm(self):
+        """Find in advance the recommendations of the sale orders being
+        prepared, with the default criteria of the wizard"""
+        wizard_obj = self.env["sale.order.recommendation"]
+        defaults_by_company = {}
+        keys = set()
+        for order in self.env["sale.order"].search(self._prewarm_orders_domain()):
+            company_wizard_obj = wizard_obj.with_company(order.company_id)
+            if order.company_id not in defaults_by_company:
+                defaults_by_company[order.company_id] = company_wizard_obj.default_get(
+                    list(wizard_obj._fields)
+                )
+            wizard = company_wizard_obj.new(
+                dict(defaults_by_company[order.company_id], order_id=order.id)
+            )
+            key = tuple(wizard._get_recommendation_cache_key().items())
+            if key not in keys:
+                keys.add(key)
+                self._get_cache(wizard)
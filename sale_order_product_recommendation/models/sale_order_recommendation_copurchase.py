@@ -0,0 +1,137 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+
+class SaleOrderRecommendationCopurchase(models.Model):
+    """Products delivered to the same customers
+
+    Sparse product co-occurrence matrix of the delivered sale order lines,
+    keeping only the most similar products of each product, used to recommend
+    the products bought by other customers along with the customer ones.
+    """
+
+    _name = "sale.order.recommendation.copurchase"
+    _description = "Sale order recommendation co-purchased products"
+    _log_access = False
+
+    company_id = fields.Many2one("res.company", required=True, readonly=True)
+    product_id = fields.Many2one("product.product", required=True, readonly=True)
+    related_product_id = fields.Many2one(
+        "product.product", required=True, readonly=True
+    )
+    score = fields.Float(
+        readonly=True,
+        help="Customers who bought both products, divided by the geometric "
+        "mean of the customers who bought each of them",
+    )
+
+    def init(self):
+        create_index(
+            self.env.cr,
+            "sale_order_recommendation_copurchase_product_index",
+            self._table,
+            ["company_id", "product_id"],
+        )
+
+    @api.model
+    def _refresh(self, companies=None):
+        """Compute again the co-purchased products of the given companies, or
+        else of all the companies where they are recommended"""
+        if companies is None:
+            companies = self.env["res.company"].search(
+                [("sale_recommendation_copurchase_count", ">", 0)]
+            )
+        self.env.flush_all()
+        delivery_clause = ""
+        if "is_delivery" in self.env["sale.order.line"]._fields:
+            delivery_clause = "AND NOT COALESCE(sol.is_delivery, FALSE)"
+        for company in companies:
+            self.env.cr.execute(
+                "DELETE FROM sale_order_recommendation_copurchase "
+                "WHERE company_id = %s",
+                (company.id,),
+            )
+            if not company.sale_recommendation_copurchase_count:
+                continue
+            # pylint: disable=sql-injection
+            self.env.cr.execute(
+                f"""
+                WITH basket AS (
+                    SELECT DISTINCT p.commercial_partner_id, sol.product_id
+                    FROM sale_order_line sol
+                    JOIN sale_order so ON so.id = sol.order_id
+                    JOIN res_partner p ON p.id = so.partner_id
+                    WHERE so.company_id = %(company_id)s
+                        AND sol.product_id IS NOT NULL
+                        AND sol.qty_delivered != 0
+                        AND so.date_order >= %(start)s
+                        {delivery_clause}
+                ),
+                customers AS (
+                    SELECT product_id, COUNT(*) AS count
+                    FROM basket
+                    GROUP BY product_id
+                ),
+                pair AS (
+                    SELECT
+                        a.product_id,
+                        b.product_id AS related_product_id,
+                        COUNT(*) AS count
+                    FROM basket a
+                    JOIN basket b
+                        ON b.commercial_partner_id = a.commercial_partner_id
+                        AND b.product_id != a.product_id
+                    GROUP BY a.product_id, b.product_id
+                ),
+                scored AS (
+                    SELECT
+                        pair.product_id,
+                        pair.related_product_id,
+                        pair.count / sqrt(ca.count * cb.count) AS score
+                    FROM pair
+                    JOIN customers ca ON ca.product_id = pair.product_id
+                    JOIN customers cb ON cb.product_id = pair.related_product_id
+                ),
+                ranked AS (
+                    SELECT
+                        scored.*,
+                        row_number() OVER (
+                            PARTITION BY product_id
+                            ORDER BY score DESC, related_product_id
+                        ) AS rank
+                    FROM scored
+                )
+                INSERT INTO sale_order_recommendation_copurchase (
+                    company_id, product_id, related_product_id, score
+                )
+                SELECT %(company_id)s, product_id, related_product_id, score
+                FROM ranked
+                WHERE rank <= %(limit)s
+                """,
+                {
+                    "company_id": company.id,
+                    "start": fields.Datetime.now()
+                    - relativedelta(
+                        months=company.sale_recommendation_copurchase_months
+                    ),
+                    "limit": self._get_products_per_product(company),
+                },
+            )
+            _logger.info(
+                "Computed %d co-purchased products for company %s",
+                self.env.cr.rowcount,
+                company.name,
+            )
+        self.invalidate_model()
+
+    @api.model
+    def _get_products_per_product(self, company):
+        """Number of co-purchased products kept for each product"""
+        return max(company.sale_recommendation_copurchase_count * 5, 50)
@@ -0,0 +1,160 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models
+from odoo.tools.sql import create_index
+
+
+class SaleOrderRecommendationStat(models.Model):
+    """Delivered products per customer, delivery address and month
+
+    Materialized aggregate of the delivered sale order lines, used to find
+    the recommended products without reading the whole sales history.
+    """
+
+    _name = "sale.order.recommendation.stat"
+    _description = "Sale order recommendation statistics"
+    _log_access = False
+
+    company_id = fields.Many2one("res.company", required=True, readonly=True)
+    commercial_partner_id = fields.Many2one(
+        "res.partner", required=True, readonly=True
+    )
+    partner_shipping_id = fields.Many2one("res.partner", readonly=True)
+    product_id = fields.Many2one("product.product", required=True, readonly=True)
+    date = fields.Date(
+        string="Month", required=True, readonly=True, help="First day of the month"
+    )
+    times_delivered = fields.Integer(readonly=True)
+    units_delivered = fields.Float(readonly=True)
+
+    def init(self):
+        create_index(
+            self.env.cr,
+            "sale_order_recommendation_stat_partner_date_index",
+            self._table,
+            ["company_id", "commercial_partner_id", "date"],
+        )
+        create_index(
+            self.env.cr,
+            "sale_order_recommendation_stat_shipping_date_index",
+            self._table,
+            ["company_id", "partner_shipping_id", "date"],
+        )
+
+    @api.model
+    def _get_stored_keys(self, line_ids=None, order_ids=None):
+        """Return the (company, commercial partner, product) keys of the
+        delivered lines of the given ids or sale orders, as stored in the
+        database
+
+        They are read in the database, as the cache already holds the new
+        values when the lines or the orders are written at flush time.
+        """
+        if line_ids:
+            clause, ids = "sol.id IN %s", line_ids
+        elif order_ids:
+            clause, ids = "sol.order_id IN %s", order_ids
+        else:
+            return set()
+        # pylint: disable=sql-injection
+        self.env.cr.execute(
+            f"""
+            SELECT DISTINCT so.company_id, p.commercial_partner_id, sol.product_id
+            FROM sale_order_line sol
+            JOIN sale_order so ON so.id = sol.order_id
+            JOIN res_partner p ON p.id = so.partner_id
+            JOIN res_company c ON c.id = so.company_id
+            WHERE {clause}
+                AND c.sale_recommendation_use_stats
+                AND sol.product_id IS NOT NULL
+                AND sol.qty_delivered != 0
+            """,
+            (tuple(ids),),
+        )
+        return set(self.env.cr.fetchall())
+
+    @api.model
+    def _add_keys_to_refresh(self, keys):
+        """Refresh the statistics of the given (company, commercial partner,
+        product) keys before the commit of the transaction"""
+        keys = {key for key in keys if all(key)}
+        if not keys:
+            return
+        pending_keys = self.env.cr.precommit.data.setdefault(self._name, set())
+        if not pending_keys:
+            self.env.cr.precommit.add(self.sudo()._refresh_pending)
+        pending_keys.update(keys)
+
+    @api.model
+    def _refresh_pending(self):
+        keys = self.env.cr.precommit.data.pop(self._name, set())
+        if keys:
+            self._refresh(keys=keys)
+
+    @api.model
+    def _refresh(self, keys=None, companies=None):
+        """Compute again the statistics of the given (company, commercial
+        partner, product) keys or companies, or else of all the companies"""
+        self.env.flush_all()
+        key_clause, params = "TRUE", []
+        if keys is not None:
+            key_clause = "(company_id, commercial_partner_id, product_id) IN %s"
+            params.append(tuple(keys))
+        elif companies is not None:
+            key_clause = "company_id IN %s"
+            params.append(tuple(companies.ids))
+        delivery_clause = ""
+        if "is_delivery" in self.env["sale.order.line"]._fields:
+            delivery_clause = "AND NOT COALESCE(sol.is_delivery, FALSE)"
+        # pylint: disable=sql-injection
+        self.env.cr.execute(
+            f"DELETE FROM sale_order_recommendation_stat WHERE {key_clause}", params
+        )
+        self.env.cr.execute(
+            f"""
+            INSERT INTO sale_order_recommendation_stat (
+                company_id,
+                commercial_partner_id,
+                partner_shipping_id,
+                product_id,
+                date,
+                times_delivered,
+                units_delivered
+            )
+            SELECT
+                stat.company_id,
+                stat.commercial_partner_id,
+                stat.partner_shipping_id,
+                stat.product_id,
+                stat.date,
+                COUNT(*),
+                SUM(stat.qty_delivered)
+            FROM (
+                SELECT
+                    so.company_id,
+                    p.commercial_partner_id,
+                    so.partner_shipping_id,
+                    sol.product_id,
+                    date_trunc('month', so.date_order)::date AS date,
+                    sol.qty_delivered
+                FROM sale_order_line sol
+                JOIN sale_order so ON so.id = sol.order_id
+                JOIN res_partner p ON p.id = so.partner_id
+                JOIN res_company c ON c.id = so.company_id
+                WHERE c.sale_recommendation_use_stats
+                    AND sol.product_id IS NOT NULL
+                    AND sol.qty_delivered != 0
+                    AND so.date_order IS NOT NULL
+                    {delivery_clause}
+            ) stat
+            WHERE {key_clause}
+            GROUP BY
+                stat.company_id,
+                stat.commercial_partner_id,
+                stat.partner_shipping_id,
+                stat.product_id,
+                stat.date
+            """,
+            params,
+        )
+        self.invalidate_model()
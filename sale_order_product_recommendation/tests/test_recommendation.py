@@ -3,6 +3,8 @@
 # Copyright 2021 Tecnativa - Víctor Martínez
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+from datetime import datetime
+
 from freezegun import freeze_time
 
 from odoo.exceptions import UserError
@@ -267,6 +269,54 @@ class RecommendationCaseTests(RecommendationCase):
         wiz_line_prod2 = wizard.line_ids.filtered(lambda x: x.product_id == self.prod_2)
         self.assertEqual(wiz_line_prod2.price_unit, 89.00)
 
+    def test_recommendations_pricelist_quantity_break(self):
+        self.pricelist.sudo().item_ids = [
+            (
+                0,
+                0,
+                {
+                    "applied_on": "0_product_variant",
+                    "product_id": self.prod_1.id,
+                    "min_quantity": 10,
+                    "compute_price": "fixed",
+                    "fixed_price": 20.0,
+                },
+            )
+        ]
+        wizard = self.wizard()
+        wizard.sale_recommendation_price_origin = "pricelist"
+        wiz_line_prod1 = wizard.line_ids.filtered(lambda x: x.product_id == self.prod_1)
+        self.assertEqual(wiz_line_prod1.price_unit, 25.00)
+        wizard.generate_recommendations()
+        wiz_line_prod1 = wizard.line_ids.filtered(lambda x: x.product_id == self.prod_1)
+        stored_prices = dict(wizard.pricelist_prices)
+        self.assertEqual(len(stored_prices), len(wizard.line_ids))
+        # Below the break, the stored price is reused
+        wiz_line_prod1.units_included = 5
+        self.assertEqual(wiz_line_prod1.price_unit, 25.00)
+        # Crossing the break computes the new price of this line, which is
+        # not stored
+        wiz_line_prod1.units_included = 10
+        self.assertEqual(wiz_line_prod1.price_unit, 20.00)
+        self.assertEqual(wizard.pricelist_prices, stored_prices)
+
+    def test_recommendations_last_sale_price_cache(self):
+        wizard = self.wizard()
+        wizard.sale_recommendation_price_origin = "last_sale_price"
+        wizard.generate_recommendations()
+        self.assertEqual(
+            wizard._get_last_sale_prices(),
+            {self.prod_1.id: 24.50, self.prod_2.id: 49.50, self.prod_3.id: 74.50},
+        )
+        # Prices are stored with the generated recommendations
+        self.order2.date_order = "2021-05-07"
+        wiz_line_prod2 = wizard.line_ids.filtered(lambda x: x.product_id == self.prod_2)
+        self.assertEqual(wiz_line_prod2._get_last_sale_price_product(), 49.50)
+        # Until recommendations are generated again
+        wizard.generate_recommendations()
+        wiz_line_prod2 = wizard.line_ids.filtered(lambda x: x.product_id == self.prod_2)
+        self.assertEqual(wiz_line_prod2.price_unit, 89.00)
+
     def test_recommendations_last_sale_price_to_sale_order(self):
         # Display product price from last sale order price
         wizard = self.wizard()
@@ -349,3 +399,128 @@ class RecommendationCaseTests(RecommendationCase):
         self.new_so.partner_id = new_partner
         with self.assertRaisesRegex(UserError, "Nothing found!"):
             self.wizard()
+
+    def test_recommendations_from_stats(self):
+        self.new_so.company_id.sudo().sale_recommendation_use_stats = True
+        stats = self.env["sale.order.recommendation.stat"].search(
+            [("commercial_partner_id", "=", self.partner.id)]
+        )
+        self.assertEqual(len(stats), 4)
+        wizard = self.wizard()
+        for product, times_delivered, units_delivered in (
+            (self.prod_1, 1, 25),
+            (self.prod_2, 2, 100),
+            (self.prod_3, 1, 100),
+        ):
+            wiz_line = wizard.line_ids.filtered(lambda x: x.product_id == product)
+            self.assertEqual(wiz_line.times_delivered, times_delivered)
+            self.assertEqual(wiz_line.units_delivered, units_delivered)
+        # The statistics are updated with the delivered quantities
+        self.order1.order_line.filtered(
+            lambda line: line.product_id == self.prod_1
+        ).qty_delivered = 0
+        self.env.cr.flush()
+        wizard.generate_recommendations()
+        self.assertEqual(wizard.line_ids.product_id, self.prod_2 + self.prod_3)
+        # Lines without delivered quantities don't refresh the statistics
+        self.new_so.order_line = [(0, 0, {"product_id": self.prod_2.id})]
+        self.new_so.date_order = "2021-10-01"
+        self.assertFalse(
+            self.env.cr.precommit.data.get("sale.order.recommendation.stat")
+        )
+        # The limit applies to the products not in the sale order
+        wizard.line_amount = 1
+        wizard.generate_recommendations()
+        self.assertEqual(wizard.line_ids.product_id, self.prod_2 + self.prod_3)
+        # Delivery address
+        wizard.use_delivery_address = True
+        self.new_so.partner_shipping_id = self.partner_delivery
+        wizard.generate_recommendations()
+        self.assertEqual(wizard.line_ids.product_id, self.prod_2)
+        self.assertEqual(wizard.line_ids.times_delivered, 1)
+
+    def test_recommendation_stats_refresh(self):
+        self.new_so.company_id.sudo().sale_recommendation_use_stats = True
+        stat_obj = self.env["sale.order.recommendation.stat"]
+        line_1, line_2 = self.order1.order_line.filtered(
+            lambda line: line.product_id in self.prod_1 + self.prod_2
+        )
+        # The statistics of the returned products are removed
+        line_1.qty_delivered = 0
+        # The statistics of the previous product are updated
+        self.order1.state = "sale"
+        line_2.product_id = self.prod_1
+        self.env.cr.flush()
+        stats = stat_obj.search(
+            [
+                ("commercial_partner_id", "=", self.partner.id),
+                ("partner_shipping_id", "=", self.partner.id),
+            ]
+        )
+        self.assertEqual(stats.product_id, self.prod_1 + self.prod_3)
+        stat_1 = stats.filtered(lambda stat: stat.product_id == self.prod_1)
+        self.assertEqual(stat_1.times_delivered, 1)
+        self.assertEqual(stat_1.units_delivered, 50)
+
+    def test_recommendations_from_cache(self):
+        self.new_so.company_id.sudo().sale_recommendation_cache_hours = 12
+        wizard = self.wizard()
+        self.assertEqual(wizard.recommendations_date, datetime(2021, 10, 2, 15, 30))
+        products = wizard.line_ids.product_id
+        self.assertIn(self.prod_1, products)
+        # The cached recommendations are kept
+        self.order1.order_line.filtered(
+            lambda line: line.product_id == self.prod_1
+        ).qty_delivered = 0
+        wizard.generate_recommendations()
+        self.assertEqual(wizard.line_ids.product_id, products)
+        # Until they are refreshed
+        wizard.action_refresh_recommendations()
+        self.assertNotIn(self.prod_1, wizard.line_ids.product_id)
+        # The quotations are found in advance
+        cache_obj = self.env["sale.order.recommendation.cache"].sudo()
+        cache_obj.search([]).unlink()
+        cache_obj._cron_prewarm()
+        self.assertTrue(cache_obj.search([("partner_id", "=", self.partner.id)]))
+        # Expired recommendations are removed
+        with freeze_time("2021-10-03 04:00:00"):
+            cache_obj._gc_expired_cache()
+        self.assertFalse(cache_obj.search([]))
+
+    def test_recommendations_copurchased(self):
+        prod_4 = self.product_obj.create(
+            {"name": "Test Product 4", "detailed_type": "service"}
+        )
+        other_partner = self.env["res.partner"].create({"name": "Mr. Other"})
+        self.env["sale.order"].create(
+            {
+                "partner_id": other_partner.id,
+                "state": "done",
+                "date_order": "2021-09-01",
+                "order_line": [
+                    (
+                        0,
+                        0,
+                        {
+                            "product_id": product.id,
+                            "name": product.name,
+                            "product_uom_qty": 1,
+                            "qty_delivered_method": "manual",
+                            "qty_delivered": 1,
+                        },
+                    )
+                    for product in (self.prod_1, prod_4)
+                ],
+            }
+        )
+        self.new_so.company_id.sudo().sale_recommendation_copurchase_count = 1
+        copurchases = self.env["sale.order.recommendation.copurchase"].search(
+            [("product_id", "=", self.prod_1.id)]
+        )
+        self.assertEqual(
+            copurchases.related_product_id, self.prod_2 + self.prod_3 + prod_4
+        )
+        wizard = self.wizard()
+        wiz_line_prod4 = wizard.line_ids.filtered(lambda x: x.product_id == prod_4)
+        self.assertEqual(wiz_line_prod4.times_delivered, 0)
+        self.assertAlmostEqual(wiz_line_prod4.score, 2**-0.5)
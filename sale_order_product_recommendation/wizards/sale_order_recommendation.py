@@ -2,9 +2,14 @@
 # Copyright 2018 Carlos Dauden <carlos.dauden@tecnativa.com>
 # Copyright 2020 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import hashlib
 import logging
+from bisect import bisect_right
+from collections import defaultdict
 from datetime import datetime, timedelta
 
+from dateutil.relativedelta import relativedelta
+
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 from odoo.osv import expression
@@ -46,6 +51,22 @@ class SaleOrderRecommendation(models.TransientModel):
         default="pricelist",
     )
     use_delivery_address = fields.Boolean(string="Use delivery address")
+    last_sale_prices = fields.Json(
+        readonly=True,
+        help="Technical field: last sale price of the products of the lines, "
+        "stored when the recommendations are generated.",
+    )
+    pricelist_prices = fields.Json(
+        readonly=True,
+        help="Technical field: pricelist unit price of the products of the lines "
+        "per unit of measure and pricelist minimum quantity break, stored when "
+        "the recommendations are generated.",
+    )
+    recommendations_date = fields.Datetime(
+        string="As of",
+        readonly=True,
+        help="Date of the cached recommendations",
+    )
     recommendations_order = fields.Selection(
         [
             ("times_delivered desc", "Times delivered"),
@@ -66,18 +87,21 @@ class SaleOrderRecommendation(models.TransientModel):
         """Extra domain to include or exclude SO lines"""
         return safe_eval(self.env.user.company_id.sale_line_recommendation_domain)
 
-    def _recommendable_sale_order_lines_domain(self):
+    def _get_recommendation_start(self):
+        """Start of the period of the delivered products to recommend"""
+        return datetime.now() - timedelta(days=self.months * 30)
+
+    def _get_recommendation_partner(self):
+        """Return the partner whose delivered products are recommended and
+        the sale order field matching it"""
+        if self.use_delivery_address:
+            return self.order_id.partner_shipping_id, "partner_shipping_id"
+        return self.order_id.partner_id.commercial_partner_id, "partner_id"
+
+    def _recommendable_sale_order_lines_domain(self, include_current_order=False):
         """Domain to find recent SO lines."""
-        start = datetime.now() - timedelta(days=self.months * 30)
-        start = fields.Datetime.to_string(start)
-        partner = (
-            self.order_id.partner_shipping_id
-            if self.use_delivery_address
-            else self.order_id.partner_id.commercial_partner_id
-        )
-        sale_order_partner_field = (
-            "partner_shipping_id" if self.use_delivery_address else "partner_id"
-        )
+        start = fields.Datetime.to_string(self._get_recommendation_start())
+        partner, sale_order_partner_field = self._get_recommendation_partner()
         # Search with sudo for get sale order from other commercials users
         other_sales = (
             self.env["sale.order"]
@@ -90,8 +114,10 @@ class SaleOrderRecommendation(models.TransientModel):
                 ]
             )
         )
+        if not include_current_order:
+            other_sales -= self.order_id
         domain = [
-            ("order_id", "in", (other_sales - self.order_id).ids),
+            ("order_id", "in", other_sales.ids),
             ("product_id.active", "=", True),
             ("product_id.sale_ok", "=", True),
             ("qty_delivered", "!=", 0.0),
@@ -105,6 +131,236 @@ class SaleOrderRecommendation(models.TransientModel):
         domain = expression.AND([domain, extended_domain])
         return domain
 
+    def _use_recommendation_stats(self):
+        """The statistics can not be filtered by the extended domain"""
+        return (
+            self.order_id.company_id.sale_recommendation_use_stats
+            and not self._extended_recommendable_sale_order_lines_domain()
+        )
+
+    def _recommendation_stats_domain(self):
+        """Domain to find the recent statistics of delivered products"""
+        start = self._get_recommendation_start()
+        partner, __ = self._get_recommendation_partner()
+        stat_partner_field = (
+            "partner_shipping_id"
+            if self.use_delivery_address
+            else "commercial_partner_id"
+        )
+        return [
+            ("company_id", "=", self.order_id.company_id.id),
+            (stat_partner_field, "child_of", partner.id),
+            ("date", ">=", start.date().replace(day=1)),
+            ("product_id.active", "=", True),
+            ("product_id.sale_ok", "=", True),
+        ]
+
+    def _use_recommendation_cache(self):
+        return bool(self.order_id.company_id.sale_recommendation_cache_hours)
+
+    def _get_recommendation_cache_key(self):
+        """Values of the criteria of the cached recommendations"""
+        partner, __ = self._get_recommendation_partner()
+        extended_domain = self._extended_recommendable_sale_order_lines_domain()
+        return {
+            "company_id": self.order_id.company_id.id,
+            "partner_id": partner.id,
+            "use_delivery_address": self.use_delivery_address,
+            "months": self.months,
+            "domain_hash": hashlib.sha1(repr(extended_domain).encode()).hexdigest(),
+        }
+
+    def _get_found_lines(self):
+        """Return the delivered products in previous months, sorted by times
+        and units delivered, in the format of a read_group on SO lines"""
+        self.recommendations_date = False
+        if self._use_recommendation_cache():
+            return self._get_found_lines_from_cache()
+        if self._use_recommendation_stats():
+            return self._get_found_lines_from_stats()
+        # Search with sudo for get sale order from other commercials users
+        found_lines = (
+            self.env["sale.order.line"]
+            .sudo()
+            .read_group(
+                self._recommendable_sale_order_lines_domain(),
+                ["product_id", "qty_delivered"],
+                ["product_id"],
+            )
+        )
+        # Manual ordering that circumvents ORM limitations
+        return sorted(
+            found_lines,
+            key=lambda res: (res["product_id_count"], res["qty_delivered"]),
+            reverse=True,
+        )
+
+    def _get_found_lines_from_stats(self):
+        """Read the best delivered products from the statistics, and the
+        statistics of the products already in the sale order"""
+        product_ids = self.order_id.order_line.product_id.ids
+        # The deliveries of the current order only change the statistics of
+        # its products, so the best other products are within this limit
+        groups = self._read_recommendation_stats(
+            limit=self.line_amount + len(product_ids)
+        )
+        if product_ids:
+            groups += self._read_recommendation_stats(
+                [("product_id", "in", product_ids)]
+            )
+        # The limit is applied again once these deliveries are subtracted
+        found_lines = self._exclude_own_deliveries(groups)
+        other_lines = [
+            line for line in found_lines if line["product_id"][0] not in product_ids
+        ]
+        kept_ids = set(product_ids) | {
+            line["product_id"][0] for line in other_lines[: self.line_amount]
+        }
+        return [line for line in found_lines if line["product_id"][0] in kept_ids]
+
+    def _read_recommendation_stats(self, domain=None, limit=None):
+        """Delivered products in the statistics, including the current order,
+        sorted by times and units delivered"""
+        groups = (
+            self.env["sale.order.recommendation.stat"]
+            .sudo()
+            .read_group(
+                self._recommendation_stats_domain() + (domain or []),
+                ["product_id", "times_delivered:sum", "units_delivered:sum"],
+                ["product_id"],
+                orderby="times_delivered desc, units_delivered desc",
+                limit=limit,
+            )
+        )
+        return [
+            {
+                "product_id": group["product_id"],
+                "product_id_count": group["times_delivered"],
+                "qty_delivered": group["units_delivered"],
+            }
+            for group in groups
+        ]
+
+    def _get_partner_found_lines(self):
+        """Delivered products in previous months, including the current
+        order, sorted by times and units delivered"""
+        if self._use_recommendation_stats():
+            return self._read_recommendation_stats()
+        groups = (
+            self.env["sale.order.line"]
+            .sudo()
+            .read_group(
+                self._recommendable_sale_order_lines_domain(
+                    include_current_order=True
+                ),
+                ["product_id", "qty_delivered"],
+                ["product_id"],
+            )
+        )
+        return sorted(
+            (
+                {
+                    "product_id": group["product_id"],
+                    "product_id_count": group["product_id_count"],
+                    "qty_delivered": group["qty_delivered"],
+                }
+                for group in groups
+            ),
+            key=lambda res: (res["product_id_count"], res["qty_delivered"]),
+            reverse=True,
+        )
+
+    def _get_found_lines_from_cache(self):
+        """Read the delivered products from the recommendation cache"""
+        cache = self.env["sale.order.recommendation.cache"].sudo()._get_cache(self)
+        self.recommendations_date = cache.date
+        return self._exclude_own_deliveries(cache.found_lines)
+
+    def _exclude_own_deliveries(self, groups):
+        """Remove the deliveries of the current order from the delivered
+        products, which are found in the statistics or the cache"""
+        start = self._get_recommendation_start()
+        own_deliveries = {}
+        if self.order_id.date_order and self.order_id.date_order >= start:
+            for line in self.order_id.order_line.filtered("qty_delivered"):
+                times, units = own_deliveries.get(line.product_id.id, (0, 0.0))
+                own_deliveries[line.product_id.id] = (
+                    times + 1,
+                    units + line.qty_delivered,
+                )
+        partner, sale_order_partner_field = self._get_recommendation_partner()
+        lines_domain = [
+            ("order_id.company_id", "=", self.order_id.company_id.id),
+            ("order_id.%s" % sale_order_partner_field, "child_of", partner.id),
+            ("order_id.date_order", ">=", fields.Datetime.to_string(start)),
+            ("order_id", "!=", self.order_id.id),
+            ("qty_delivered", "!=", 0.0),
+        ]
+        found_dict = {}
+        for group in groups:
+            product_id = group["product_id"][0]
+            times, units = own_deliveries.get(product_id, (0, 0.0))
+            if product_id in found_dict or group["product_id_count"] <= times:
+                continue
+            found_dict[product_id] = {
+                "product_id": tuple(group["product_id"]),
+                "product_id_count": group["product_id_count"] - times,
+                "qty_delivered": group["qty_delivered"] - units,
+                "__domain": [("product_id", "=", product_id)] + lines_domain,
+            }
+        return sorted(
+            found_dict.values(),
+            key=lambda res: (res["product_id_count"], res["qty_delivered"]),
+            reverse=True,
+        )
+
+    def _get_copurchased_lines(self, found_lines):
+        """Return the products most bought by other customers along with the
+        delivered products, which are not already recommended, with their
+        summed co-purchase score"""
+        company = self.order_id.company_id
+        if not company.sale_recommendation_copurchase_count:
+            return []
+        product_ids = {line["product_id"][0] for line in found_lines}
+        if not product_ids:
+            return []
+        excluded_ids = product_ids | set(self.order_id.order_line.product_id.ids)
+        groups = (
+            self.env["sale.order.recommendation.copurchase"]
+            .sudo()
+            .read_group(
+                [
+                    ("company_id", "=", company.id),
+                    ("product_id", "in", list(product_ids)),
+                    ("related_product_id", "not in", list(excluded_ids)),
+                    ("related_product_id.active", "=", True),
+                    ("related_product_id.sale_ok", "=", True),
+                ],
+                ["related_product_id", "score:sum"],
+                ["related_product_id"],
+                orderby="score desc",
+                limit=company.sale_recommendation_copurchase_count,
+            )
+        )
+        start = fields.Datetime.now() - relativedelta(
+            months=company.sale_recommendation_copurchase_months
+        )
+        lines_domain = [
+            ("order_id.company_id", "=", company.id),
+            ("order_id.date_order", ">=", fields.Datetime.to_string(start)),
+            ("order_id", "!=", self.order_id.id),
+            ("qty_delivered", "!=", 0.0),
+        ]
+        return [
+            {
+                "product_id": group["related_product_id"],
+                "score": group["score"],
+                "__domain": [("product_id", "=", group["related_product_id"][0])]
+                + lines_domain,
+            }
+            for group in groups
+        ]
+
     def _prepare_recommendation_line_vals(self, group_line, so_line=False):
         """Return the vals dictionary for creating a new recommendation line.
         @param group_line: Dictionary returned by the read_group operation.
@@ -115,11 +371,154 @@ class SaleOrderRecommendation(models.TransientModel):
             "times_delivered": group_line.get("product_id_count", 0),
             "units_delivered": group_line.get("qty_delivered", 0),
         }
+        if "score" in group_line:
+            vals["score"] = group_line["score"]
         if so_line:
             vals["units_included"] = so_line.product_uom_qty
             vals["sale_line_id"] = so_line.id
         return vals
 
+    def write(self, vals):
+        if "sale_recommendation_price_origin" in vals:
+            vals.update(last_sale_prices=False, pricelist_prices=False)
+        return super().write(vals)
+
+    @api.onchange("sale_recommendation_price_origin")
+    def _onchange_sale_recommendation_price_origin(self):
+        self.last_sale_prices = False
+        self.pricelist_prices = False
+
+    def _get_last_sale_prices(self, products=None):
+        """Return the last sale price per product of the recommendation lines
+
+        The prices stored on the wizard when the recommendations are
+        generated are reused, the other ones are fetched with one query,
+        bypassing the access rules to read sale orders from other users like
+        other commercials.
+        """
+        self.ensure_one()
+        if products is None:
+            products = self.line_ids.product_id
+        prices = {
+            int(product_id): price
+            for product_id, price in (self.last_sale_prices or {}).items()
+        }
+        missing_product_ids = [
+            product_id for product_id in products.ids if product_id not in prices
+        ]
+        if missing_product_ids:
+            prices.update(dict.fromkeys(missing_product_ids, 0.0))
+            self.env["sale.order"].flush_model(
+                ["company_id", "partner_id", "date_order", "state"]
+            )
+            self.env["sale.order.line"].flush_model(
+                ["order_id", "product_id", "price_unit"]
+            )
+            self.env.cr.execute(
+                """
+                SELECT DISTINCT ON (sol.product_id) sol.product_id, sol.price_unit
+                FROM sale_order_line sol
+                JOIN sale_order so ON so.id = sol.order_id
+                WHERE so.company_id = %s
+                    AND so.partner_id = %s
+                    AND so.date_order IS NOT NULL
+                    AND so.state NOT IN ('draft', 'sent', 'cancel')
+                    AND sol.product_id IN %s
+                ORDER BY sol.product_id, so.date_order DESC, so.id DESC, sol.id DESC
+                """,
+                (
+                    self.order_id.company_id.id,
+                    self.order_id.partner_id.id,
+                    tuple(missing_product_ids),
+                ),
+            )
+            for product_id, price_unit in self.env.cr.fetchall():
+                prices[product_id] = price_unit or 0.0
+        return prices
+
+    def _get_pricelist_quantity_breaks(self):
+        """Minimum quantities of the order pricelist and its base pricelists.
+
+        Prices can only change when the quantity crosses one of them.
+        """
+        self.ensure_one()
+        items = self.env["product.pricelist.item"]
+        pricelists = self.order_id.pricelist_id
+        while pricelists:
+            items |= pricelists.item_ids
+            pricelists = (
+                items.filtered(lambda item: item.base == "pricelist").base_pricelist_id
+                - items.pricelist_id
+            )
+        return sorted(set(items.mapped("min_quantity")))
+
+    def _get_pricelist_prices_by_key(self, lines):
+        """Return the key of the pricelist unit price of the given
+        recommendation lines, and the prices per key
+
+        The key is made of the product, the unit of measure and the minimum
+        quantity break of the pricelist reached by the line. The prices stored
+        on the wizard when the recommendations are generated are reused, the
+        other ones are computed for all the products with one
+        ``_compute_price_rule`` call per unit of measure and quantity.
+        """
+        self.ensure_one()
+        order = self.order_id
+        breaks = self._get_pricelist_quantity_breaks()
+        prices = dict(self.pricelist_prices or {})
+        keys = {}
+        lines_to_compute = defaultdict(lambda: lines.browse())
+        for line in lines:
+            uom = line.sale_uom_id or line.product_id.uom_id
+            qty = line.units_included or 1.0
+            product_qty = uom._compute_quantity(
+                qty, line.product_id.uom_id, round=False
+            )
+            keys[line] = "%s,%s,%s" % (
+                line.product_id.id,
+                uom.id,
+                bisect_right(breaks, product_qty),
+            )
+            if keys[line] not in prices:
+                lines_to_compute[uom, line.currency_id, qty] |= line
+        for (uom, currency, qty), group_lines in lines_to_compute.items():
+            price_rules = order.pricelist_id._compute_price_rule(
+                group_lines.product_id,
+                qty,
+                currency=currency,
+                uom=uom,
+                date=order.date_order,
+            )
+            for line in group_lines:
+                prices[keys[line]] = line.product_id._get_tax_included_unit_price(
+                    order.company_id,
+                    currency,
+                    order.date_order,
+                    "sale",
+                    fiscal_position=order.fiscal_position_id,
+                    product_price_unit=price_rules[line.product_id.id][0],
+                    product_currency=currency,
+                )
+        return keys, prices
+
+    def _get_pricelist_prices(self, lines):
+        """Return the pricelist unit price of the given recommendation lines"""
+        keys, prices = self._get_pricelist_prices_by_key(lines)
+        return {line: prices[keys[line]] for line in lines}
+
+    def _store_recommendation_prices(self, lines):
+        """Store on the wizard the prices of the generated recommendation
+        lines, so they are not fetched again while they are edited"""
+        if self.sale_recommendation_price_origin == "last_sale_price":
+            self.last_sale_prices = {
+                str(product_id): price
+                for product_id, price in self._get_last_sale_prices(
+                    lines.product_id
+                ).items()
+            }
+        else:
+            self.pricelist_prices = self._get_pricelist_prices_by_key(lines)[1]
+
     def _reopen_wizard(self):
         """Tell the client to close the wizard and open it again."""
         return {
@@ -137,23 +536,10 @@ class SaleOrderRecommendation(models.TransientModel):
 
     def generate_recommendations(self):
         """Generate lines according to context sale order."""
+        self.last_sale_prices = False
+        self.pricelist_prices = False
         # Search delivered products in previous months
-        # Search with sudo for get sale order from other commercials users
-        found_lines = (
-            self.env["sale.order.line"]
-            .sudo()
-            .read_group(
-                self._recommendable_sale_order_lines_domain(),
-                ["product_id", "qty_delivered"],
-                ["product_id"],
-            )
-        )
-        # Manual ordering that circumvents ORM limitations
-        found_lines = sorted(
-            found_lines,
-            key=lambda res: (res["product_id_count"], res["qty_delivered"]),
-            reverse=True,
-        )
+        found_lines = self._get_found_lines()
         found_dict = {product["product_id"][0]: product for product in found_lines}
         recommendation_lines = self.env["sale.order.recommendation.line"]
         existing_product_ids = set()
@@ -185,6 +571,12 @@ class SaleOrderRecommendation(models.TransientModel):
             i += 1
             if i >= self.line_amount:
                 break
+        # Add the products bought by other customers along with these ones
+        for line in self._get_copurchased_lines(found_lines):
+            recommendation_lines += recommendation_lines.new(
+                self._prepare_recommendation_line_vals(line)
+            )
+        self._store_recommendation_prices(recommendation_lines)
         # Sort recommendations by user choice
         order_field, order_dir = map(str.lower, self.recommendations_order.split())
         # Priority order (which can have an str value "0" or "1") must always
@@ -204,6 +596,16 @@ class SaleOrderRecommendation(models.TransientModel):
         # Reopen wizard
         return self._reopen_wizard()
 
+    def action_refresh_recommendations(self):
+        """Discard the cached recommendations and find them again"""
+        self.env["sale.order.recommendation.cache"].sudo().search(
+            [
+                (field, "=", value)
+                for field, value in self._get_recommendation_cache_key().items()
+            ]
+        ).unlink()
+        return self.generate_recommendations()
+
     def action_accept(self):
         """Propagate recommendations to sale order."""
         sequence = max(self.order_id.mapped("order_line.sequence") or [0])
@@ -267,6 +669,10 @@ class SaleOrderRecommendationLine(models.TransientModel):
     pricelist_id = fields.Many2one(related="wizard_id.order_id.pricelist_id")
     times_delivered = fields.Integer(readonly=True)
     units_delivered = fields.Float(readonly=True)
+    score = fields.Float(
+        readonly=True,
+        help="Co-purchase score of the products bought by other customers",
+    )
     units_included = fields.Float()
     wizard_id = fields.Many2one(
         "sale.order.recommendation",
@@ -304,11 +710,20 @@ class SaleOrderRecommendationLine(models.TransientModel):
         price_origin = (
             fields.first(self).wizard_id.sale_recommendation_price_origin or "pricelist"
         )
+        lines_by_wizard = defaultdict(lambda: self.browse())
         for line in self:
+            lines_by_wizard[line.wizard_id] |= line
+        for wizard, lines in lines_by_wizard.items():
             if price_origin == "pricelist":
-                line.price_unit = line._get_unit_price_from_pricelist()
+                prices = wizard._get_pricelist_prices(lines)
             else:
-                line.price_unit = line._get_last_sale_price_product()
+                last_sale_prices = wizard._get_last_sale_prices(lines.product_id)
+                prices = {
+                    line: last_sale_prices.get(line.product_id.id, 0.0)
+                    for line in lines
+                }
+            for line in lines:
+                line.price_unit = prices[line]
 
     def _prepare_update_so_line_vals(self):
         vals = {"product_uom_qty": self.units_included}
@@ -330,60 +745,11 @@ class SaleOrderRecommendationLine(models.TransientModel):
         return vals
 
     def _get_last_sale_price_product(self):
-        """
-        Get last price from last order.
-        Use sudo to read sale order from other users like as other commercials.
-        """
+        """Get last price from last order, stored on the wizard."""
         self.ensure_one()
-        so = (
-            self.env["sale.order"]
-            .sudo()
-            .search(
-                [
-                    ("company_id", "=", self.wizard_id.order_id.company_id.id),
-                    ("partner_id", "=", self.partner_id.id),
-                    ("date_order", "!=", False),
-                    ("state", "not in", ("draft", "sent", "cancel")),
-                    ("order_line.product_id", "=", self.product_id.id),
-                ],
-                limit=1,
-                order="date_order DESC, id DESC",
-            )
-        )
-        so_line = (
-            self.env["sale.order.line"]
-            .sudo()
-            .search(
-                [("order_id", "=", so.id), ("product_id", "=", self.product_id.id)],
-                limit=1,
-                order="id DESC",
-            )
-            .with_context(prefetch_fields=False)
-        )
-        return so_line.price_unit or 0.0
+        prices = self.wizard_id._get_last_sale_prices(self.product_id)
+        return prices.get(self.product_id.id, 0.0)
 
     def _get_unit_price_from_pricelist(self):
-        pricelist_rule_id = self.pricelist_id._get_product_rule(
-            self.product_id,
-            self.units_included or 1.0,
-            uom=self.sale_uom_id or self.product_id.uom_id,
-            date=self.wizard_id.order_id.date_order,
-        )
-        pricelist_rule = self.env["product.pricelist.item"].browse(pricelist_rule_id)
-        price_rule = pricelist_rule._compute_price(
-            self.product_id,
-            self.units_included,
-            self.sale_uom_id or self.product_id.uom_id,
-            self.wizard_id.order_id.date_order,
-            currency=self.currency_id,
-        )
-        price_unit = self.product_id._get_tax_included_unit_price(
-            self.wizard_id.order_id.company_id,
-            self.currency_id,
-            self.wizard_id.order_id.date_order,
-            "sale",
-            fiscal_position=self.wizard_id.order_id.fiscal_position_id,
-            product_price_unit=price_rule,
-            product_currency=self.currency_id,
-        )
-        return price_unit
+        self.ensure_one()
+        return self.wizard_id._get_pricelist_prices(self)[self]
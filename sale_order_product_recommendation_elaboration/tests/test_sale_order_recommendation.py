@@ -94,3 +94,36 @@ class RecommendationCaseTests(test_recommendation_common.RecommendationCase):
         self.assertTrue(wiz_line)
         self.assertEqual(wiz_line.elaboration_ids, self.elab_2)
         self.assertEqual(wiz_line.elaboration_note, "custom")
+
+    def test_recommendations_copurchased(self):
+        prod_4 = self.env["product.product"].create(
+            {"name": "Test Product 4", "detailed_type": "service"}
+        )
+        other_partner = self.env["res.partner"].create({"name": "Mr. Other"})
+        other_order = self.env["sale.order"].create(
+            {
+                "partner_id": other_partner.id,
+                "state": "done",
+                "date_order": "2021-09-01",
+                "order_line": [
+                    Command.create(
+                        {
+                            "product_id": product.id,
+                            "name": product.name,
+                            "product_uom_qty": 1,
+                            "qty_delivered_method": "manual",
+                            "qty_delivered": 1,
+                        }
+                    )
+                    for product in (self.prod_2, prod_4)
+                ],
+            }
+        )
+        other_order.order_line.filtered(
+            lambda line: line.product_id == prod_4
+        ).elaboration_ids = self.elab_2
+        self.new_so.company_id.sudo().sale_recommendation_copurchase_count = 1
+        wizard = self.wizard()
+        wiz_line = wizard.line_ids.filtered_domain([("product_id", "=", prod_4.id)])
+        self.assertTrue(wiz_line.score)
+        self.assertEqual(wiz_line.elaboration_ids, self.elab_2)